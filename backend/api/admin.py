@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from .models import Upload
+
+
+class UploadAdmin(admin.ModelAdmin):
+    """Управление загрузками"""
+
+    list_display = ('token', 'user', 'file', 'created')
+    list_filter = ('user',)
+
+
+admin.site.register(Upload, UploadAdmin)
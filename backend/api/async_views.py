@@ -0,0 +1,240 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+from .filters import RecipeFilter
+from .ingredient_search import ingredient_index
+from .middleware import execute_wrappers
+from .pagination import CustomPageNumberPagination
+from .relations import CART, FAVOURITES, FOLLOWS, get_user_relations
+from .serializers import (FollowSerializer, IngredientSerializer,
+                          RecipeReadSerializer, TagSerializer,
+                          load_recipe_cards)
+from .sparse import is_requested, sparse_fieldset
+
+DB_WORKERS = settings.ASYNC_DB_WORKERS
+
+db_executor = ThreadPoolExecutor(
+    max_workers=DB_WORKERS, thread_name_prefix='async-db'
+)
+
+
+def run_query(func, *args):
+    """Выполняет func в потоке пула на постоянном соединении потока.
+
+    В отличие от обычного запроса соединение после вызова не закрывается
+    и переиспользуется следующими вызовами в этом потоке. Закрывается
+    только соединение, которое после ошибки стало непригодным.
+    """
+    try:
+        with execute_wrappers():
+            return func(*args)
+    finally:
+        if connection.connection is not None and connection.errors_occurred:
+            if connection.is_usable():
+                connection.errors_occurred = False
+            else:
+                connection.close()
+
+
+def close_db_connections():
+    """Закрывает соединения всех потоков пула.
+
+    Задачи ждут друг друга на барьере, поэтому каждая выполняется в
+    отдельном потоке. Нужно, например, перед удалением тестовой базы.
+    """
+    barrier = threading.Barrier(DB_WORKERS)
+
+    def close():
+        barrier.wait()
+        connection.close()
+
+    for future in [db_executor.submit(close) for _ in range(DB_WORKERS)]:
+        future.result()
+
+
+async def db(func, *args):
+    """Выполняет синхронный код с обращениями к БД в пуле потоков.
+
+    В Django 3.2 нет асинхронного ORM, поэтому независимые запросы
+    выполняются параллельно в отдельных потоках со своими соединениями.
+    Контекст копируется в поток, чтобы middleware видели эти запросы.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        db_executor, context.run, run_query, func, *args
+    )
+
+
+def async_api(view):
+    """Асинхронное GET-представление с токен-авторизацией DRF и JSON"""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return JsonResponse(
+                {'detail': f'Метод "{request.method}" не разрешен.'},
+                status=405
+            )
+        drf_request = Request(request)
+        try:
+            user = await db(TokenAuthentication().authenticate, request)
+            drf_request.user = user[0] if user else AnonymousUser()
+            data = await view(drf_request, *args, **kwargs)
+        except APIException as error:
+            return JsonResponse(
+                {'detail': error.detail}, status=error.status_code
+            )
+        except Http404:
+            return JsonResponse({'detail': 'Страница не найдена.'}, status=404)
+        return JsonResponse(
+            data, safe=False, json_dumps_params={'ensure_ascii': False}
+        )
+
+    return wrapper
+
+
+def get_page(request):
+    try:
+        page = int(request.query_params.get('page', 1))
+        limit = int(request.query_params.get(
+            CustomPageNumberPagination.page_size_query_param,
+            CustomPageNumberPagination.page_size
+        ))
+    except ValueError:
+        raise Http404
+    if page < 1 or limit < 1:
+        raise Http404
+    return page, limit
+
+
+def paginated(request, count, page, limit, results):
+    if page > 1 and (page - 1) * limit >= count:
+        raise Http404
+    url = request.build_absolute_uri()
+    previous = None
+    if page == 2:
+        previous = remove_query_param(url, 'page')
+    elif page > 2:
+        previous = replace_query_param(url, 'page', page - 1)
+    return {
+        'count': count,
+        'next': (
+            replace_query_param(url, 'page', page + 1)
+            if page * limit < count else None
+        ),
+        'previous': previous,
+        'results': results,
+    }
+
+
+async def load_recipe_relations(recipes, request, fields):
+    """Параллельно подгружает карточки рецептов и множества пользователя"""
+    lookups = [db(load_recipe_cards, recipes)]
+    if request.user.is_authenticated:
+        names = [
+            name for name, field in (
+                (FAVOURITES, 'is_favorited'),
+                (CART, 'is_in_shopping_cart'),
+                (FOLLOWS, 'author'),
+            ) if is_requested(field, fields)
+        ]
+        lookups.append(db(load_relations, request, names))
+    await asyncio.gather(*lookups)
+
+
+def load_relations(request, names):
+    relations = get_user_relations(request)
+    for name in names:
+        relations.get(name)
+
+
+def serialize(serializer_class, instance, request, many=False):
+    return serializer_class(
+        instance, many=many, context={'request': request}
+    ).data
+
+
+@async_api
+async def recipe_list(request):
+    fields, expand = sparse_fieldset(request)
+    page, limit = get_page(request)
+    queryset = await db(lambda: RecipeFilter(
+        request.query_params,
+        queryset=RecipeReadSerializer.setup_eager_loading(
+            Recipe.objects.all(), fields, expand
+        ),
+        request=request
+    ).qs)
+    offset = (page - 1) * limit
+    count, recipes = await asyncio.gather(
+        db(queryset.count), db(list, queryset[offset:offset + limit])
+    )
+    await load_recipe_relations(recipes, request, fields)
+    results = await db(
+        serialize, RecipeReadSerializer, recipes, request, True
+    )
+    return paginated(request, count, page, limit, results)
+
+
+@async_api
+async def recipe_detail(request, pk):
+    fields, expand = sparse_fieldset(request)
+    recipe = await db(lambda: get_object_or_404(
+        RecipeReadSerializer.setup_eager_loading(
+            Recipe.objects.all(), fields, expand
+        ),
+        pk=pk
+    ))
+    await load_recipe_relations([recipe], request, fields)
+    return await db(serialize, RecipeReadSerializer, recipe, request)
+
+
+@async_api
+async def ingredient_list(request):
+    name = request.query_params.get('name')
+    if name:
+        return await db(ingredient_index.search, name)
+    return await db(
+        serialize, IngredientSerializer, Ingredient.objects.all(), request,
+        True
+    )
+
+
+@async_api
+async def tag_list(request):
+    return await db(
+        serialize, TagSerializer, Tag.objects.all(), request, True
+    )
+
+
+@async_api
+async def subscriptions(request):
+    user = request.user
+    if not user.is_authenticated:
+        raise NotAuthenticated
+    fields, _ = sparse_fieldset(request)
+    page, limit = get_page(request)
+    queryset = FollowSerializer.setup_eager_loading(
+        User.objects.filter(following__user=user), fields
+    )
+    offset = (page - 1) * limit
+    count, authors = await asyncio.gather(
+        db(queryset.count), db(list, queryset[offset:offset + limit])
+    )
+    results = await db(serialize, FollowSerializer, authors, request, True)
+    return paginated(request, count, page, limit, results)
@@ -0,0 +1,111 @@
+from django.db import connection
+
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+
+
+def can_return_rows():
+    """Поддерживает ли база RETURNING в INSERT ON CONFLICT и DELETE"""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def relation_sql(model, field):
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field('user').column),
+        quote(model._meta.get_field(field).column),
+    )
+
+
+def insert_relations(model, user, field, ids):
+    """Вставляет связи и возвращает id объектов, для которых строка
+    действительно создана этим запросом"""
+    if not ids:
+        return set()
+    if not can_return_rows():
+        user.__class__.objects.select_for_update().filter(pk=user.pk).get()
+        lookup = f'{field}_id'
+        present = set(model.objects.filter(
+            user=user, **{f'{lookup}__in': ids}
+        ).values_list(lookup, flat=True))
+        created = [pk for pk in ids if pk not in present]
+        model.objects.bulk_create(
+            model(user=user, **{lookup: pk}) for pk in created
+        )
+        return set(created)
+    table, user_column, column = relation_sql(model, field)
+    values = ', '.join(['(%s, %s)'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {column}) '
+            f'VALUES {values} ON CONFLICT DO NOTHING RETURNING {column}',
+            [value for pk in ids for value in (user.pk, pk)]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_relations(model, user, field, ids):
+    """Удаляет связи и возвращает id объектов, чьи строки удалил этот
+    запрос"""
+    lookup = f'{field}_id'
+    relations = model.objects.filter(user=user, **{f'{lookup}__in': ids})
+    if not can_return_rows():
+        deleted = set(
+            relations.select_for_update().values_list(lookup, flat=True)
+        )
+        relations.filter(**{f'{lookup}__in': deleted}).delete()
+        return deleted
+    table, user_column, column = relation_sql(model, field)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {column} IN ({placeholders}) RETURNING {column}',
+            [user.pk, *ids]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def add_relations(model, user, field, ids, targets):
+    """Создает связи пользователя с объектами ids одним INSERT.
+
+    Существование объектов проверяется одним запросом id__in к targets.
+    Статус created получают только строки, которые вернул INSERT ON
+    CONFLICT DO NOTHING RETURNING, поэтому при параллельных запросах связь
+    создается и учитывается в счетчиках ровно один раз. Возвращает
+    статусы по каждому id и список id, для которых связь создана.
+    """
+    found = set(targets.filter(id__in=ids).values_list('id', flat=True))
+    created = insert_relations(
+        model, user, field, [pk for pk in ids if pk in found]
+    )
+    statuses = dict.fromkeys(found, EXISTS)
+    statuses.update(dict.fromkeys(created, CREATED))
+    return [
+        {'id': pk, 'status': statuses.get(pk, NOT_FOUND)} for pk in ids
+    ], [pk for pk in ids if pk in created]
+
+
+def remove_relations(model, user, field, ids):
+    """Удаляет связи пользователя с объектами ids одним запросом.
+
+    Статус deleted получают только строки, удаленные этим запросом.
+    """
+    deleted = delete_relations(model, user, field, ids)
+    return [
+        {'id': pk, 'status': DELETED if pk in deleted else NOT_FOUND}
+        for pk in ids
+    ], [pk for pk in ids if pk in deleted]
+
+
+def remove_relation(model, **fields):
+    """Удаляет связь одним запросом DELETE и сообщает, была ли она"""
+    deleted, _ = model.objects.filter(**fields).delete()
+    return bool(deleted)
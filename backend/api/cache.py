@@ -0,0 +1,93 @@
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+
+from .metrics import record_cache
+
+
+def version_path(name):
+    return os.path.join(settings.DATA_VERSIONS_DIR, name.replace(':', '-'))
+
+
+def get_version(name):
+    """Возвращает текущую версию данных.
+
+    Версия - время последнего изменения в миллисекундах. Она хранится как
+    время изменения файла в DATA_VERSIONS_DIR, поэтому одинакова для всех
+    воркеров и команд manage.py и не теряется при очистке кеша.
+    """
+    try:
+        return os.stat(version_path(name)).st_mtime_ns // 1000000
+    except FileNotFoundError:
+        return bump_version(name)
+
+
+def bump_version(name):
+    path = version_path(name)
+    try:
+        current = os.stat(path).st_mtime_ns // 1000000
+    except FileNotFoundError:
+        os.makedirs(settings.DATA_VERSIONS_DIR, exist_ok=True)
+        open(path, 'a').close()
+        current = 0
+    version = max(int(time.time() * 1000), current + 1)
+    os.utime(path, ns=(version * 1000000, version * 1000000))
+    return version
+
+
+class VersionedResponseCacheMixin:
+    """Кеширует готовые ответы read-only вьюсета.
+
+    Ключ кеша и ETag строятся из версии данных cache_version_name, пути
+    запроса и заголовка Accept, поэтому условные запросы и попадания в кеш
+    обслуживаются без обращения к базе данных.
+    """
+
+    cache_version_name = None
+    cached_actions = ('list', 'retrieve')
+    response_cache_timeout = 60 * 60 * 24
+
+    def dispatch(self, request, *args, **kwargs):
+        action = self.action_map.get(request.method.lower())
+        if action not in self.cached_actions:
+            return super().dispatch(request, *args, **kwargs)
+        version = get_version(self.cache_version_name)
+        digest = hashlib.md5(
+            f'{request.get_full_path()}|{request.META.get("HTTP_ACCEPT")}'
+            .encode()
+        ).hexdigest()
+        etag = f'"{self.cache_version_name}-{version}-{digest}"'
+        last_modified = version // 1000
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            record_cache('responses', hit=True)
+            return response
+        cache_key = f'api:response:{etag}'
+        cached = cache.get(cache_key)
+        record_cache('responses', hit=cached is not None)
+        if cached is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            response.render()
+            cache.set(
+                cache_key,
+                (response.content, response['Content-Type']),
+                self.response_cache_timeout
+            )
+        else:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Accept',))
+        return response
@@ -1,7 +1,39 @@
-from django_filters.rest_framework import (BooleanFilter, FilterSet,
-                                           ModelMultipleChoiceFilter, filters)
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Q, When
+from django_filters.fields import MultipleChoiceField
+from django_filters.rest_framework import (BooleanFilter, CharFilter,
+                                           FilterSet, MultipleChoiceFilter,
+                                           filters)
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe, Tag, tags_mask
+from recipes.search import search_recipes
+from .cache import get_version
+from .metrics import record_cache
+
+
+def get_tag_bits():
+    key = f'api:tag-bits:{get_version("tags")}'
+    tag_bits = cache.get(key)
+    record_cache('tag_bits', hit=tag_bits is not None)
+    if tag_bits is None:
+        tag_bits = {
+            slug: tags_mask([pk])
+            for pk, slug in Tag.objects.values_list('pk', 'slug')
+        }
+        cache.set(key, tag_bits)
+    return tag_bits
+
+
+class SlugMultipleChoiceField(MultipleChoiceField):
+
+    def valid_value(self, value):
+        return True
+
+
+class TagSlugsFilter(MultipleChoiceFilter):
+    """Фильтр по слагам тегов без проверки слагов в базе данных"""
+
+    field_class = SlugMultipleChoiceField
 
 
 class IngredientFilter(FilterSet):
@@ -13,17 +45,53 @@ class IngredientFilter(FilterSet):
 
 
 class RecipeFilter(FilterSet):
-    tags = ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug'
-    )
+    tags = TagSlugsFilter(method='get_tags')
     is_in_shopping_cart = BooleanFilter(method='get_is_in_shopping_cart')
     is_favorited = BooleanFilter(method='get_is_favorited')
+    search = CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_in_shopping_cart', 'is_favorited')
+        fields = ('tags', 'author', 'is_in_shopping_cart', 'is_favorited',
+                  'search')
+
+    def get_search(self, queryset, name, value):
+        """Отбирает рецепты по полнотекстовому индексу в порядке ранга.
+
+        Из индекса берутся только RECIPE_SEARCH_LIMIT лучших совпадений,
+        поэтому count в ответе не больше этого лимита.
+        """
+        recipe_ids = search_recipes(value)
+        if not recipe_ids:
+            return queryset.none()
+        return queryset.filter(pk__in=recipe_ids).order_by(Case(
+            *(When(pk=pk, then=rank) for rank, pk in enumerate(recipe_ids)),
+            output_field=IntegerField()
+        ))
+
+    def get_tags(self, queryset, name, value):
+        """Фильтрует по маске тегов, tags_match=all требует все теги.
+
+        Слаги, которых нет в маске, проверяются через связь с тегами.
+        """
+        tag_bits = get_tag_bits()
+        mask = 0
+        unknown = []
+        for slug in value:
+            if tag_bits.get(slug):
+                mask |= tag_bits[slug]
+            else:
+                unknown.append(slug)
+        queryset = queryset.alias(tag_bits=F('tags_mask').bitand(mask))
+        if self.data.get('tags_match') == 'all':
+            for slug in unknown:
+                queryset = queryset.filter(tags__slug=slug)
+            return queryset.filter(tag_bits=mask)
+        if unknown:
+            return queryset.filter(
+                Q(tag_bits__gt=0) | Q(tags__slug__in=unknown)
+            ).distinct()
+        return queryset.filter(tag_bits__gt=0)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -0,0 +1,184 @@
+import base64
+import binascii
+import logging
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import Field
+
+from recipes.models import Recipe
+from .models import Upload
+
+logger = logging.getLogger(__name__)
+
+BASE64_IMAGE_RE = re.compile(r'^data:image/(png|jpe?g|gif|webp);base64,')
+
+executor = None
+
+
+class Base64ImagePayloadField(Field):
+    """Поле изображения в base64 без полного декодирования в запросе.
+
+    Проверяет размер строки и заголовок изображения, для которого
+    декодируются только первые IMAGE_HEADER_SIZE символов: этого хватает
+    на заголовок JPEG с сегментом EXIF наибольшего размера. Исходная строка
+    целиком декодируется в конвейере обработки изображений.
+    """
+
+    default_error_messages = {
+        'invalid': 'Изображение должно быть строкой data:image/...;base64.',
+        'too_large': 'Изображение слишком большое.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or not BASE64_IMAGE_RE.match(data):
+            self.fail('invalid')
+        if len(data) > settings.IMAGE_MAX_PAYLOAD_SIZE:
+            self.fail('too_large')
+        header_size = settings.IMAGE_HEADER_SIZE - (
+            settings.IMAGE_HEADER_SIZE % 4
+        )
+        try:
+            header = base64.b64decode(
+                data.split(';base64,', 1)[1][:header_size], validate=True
+            )
+            Image.open(BytesIO(header))
+        except (binascii.Error, UnidentifiedImageError, OSError):
+            self.fail('invalid')
+        return data
+
+    def to_representation(self, value):
+        return value
+
+
+def open_image(file):
+    try:
+        image = Image.open(file)
+        image.load()
+    except (UnidentifiedImageError, OSError) as error:
+        raise ValidationError('Не удалось прочитать изображение.') from error
+    return image
+
+
+def decode_source(source):
+    """Открывает изображение из строки base64 или из загрузки"""
+    if isinstance(source, Upload):
+        with source.file.open('rb') as file:
+            return open_image(file)
+    try:
+        data = base64.b64decode(source.split(';base64,', 1)[1])
+    except binascii.Error as error:
+        raise ValidationError('Не удалось прочитать изображение.') from error
+    return open_image(BytesIO(data))
+
+
+def encode_image(image):
+    buffer = BytesIO()
+    image.save(buffer, format=settings.IMAGE_FORMAT,
+               quality=settings.IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def process_recipe_image(recipe_id, source):
+    """Перекодирует изображение рецепта и создает миниатюры"""
+    image = ImageOps.exif_transpose(decode_source(source))
+    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    image.thumbnail((settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE))
+    extension = settings.IMAGE_FORMAT.lower()
+    name = uuid.uuid4().hex
+    image_name = default_storage.save(
+        f'recipes/images/{name}.{extension}', encode_image(image)
+    )
+    thumbnails = {}
+    for size in settings.RECIPE_THUMBNAIL_SIZES:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size))
+        thumbnails[str(size)] = default_storage.save(
+            f'recipes/thumbnails/{size}/{name}.{extension}',
+            encode_image(thumbnail)
+        )
+    previous = Recipe.objects.filter(pk=recipe_id).values_list(
+        'image', 'image_thumbnails'
+    ).first()
+    updated = Recipe.objects.filter(pk=recipe_id).update(
+        image=image_name, image_thumbnails=thumbnails,
+        version=F('version') + 1
+    )
+    stale = [image_name, *thumbnails.values()]
+    if updated:
+        stale = [previous[0], *previous[1].values()] if previous else []
+    for file_name in stale:
+        if file_name:
+            default_storage.delete(file_name)
+    if isinstance(source, Upload):
+        source.file.delete(save=False)
+        source.delete()
+
+
+def process_logged(recipe_id, source):
+    try:
+        process_recipe_image(recipe_id, source)
+    except Exception:
+        logger.exception('Ошибка обработки изображения рецепта %s', recipe_id)
+
+
+def run_job(recipe_id, source):
+    close_old_connections()
+    try:
+        process_logged(recipe_id, source)
+    finally:
+        connection.close()
+
+
+def schedule_recipe_image(recipe_id, source):
+    """Отправляет изображение в пул обработки после фиксации транзакции.
+
+    Источник - строка base64 или объект Upload. Если
+    IMAGE_PROCESSING_WORKERS равен 0, изображение обрабатывается сразу в
+    текущем потоке. Ошибки обработки в обоих случаях только логируются:
+    ответ клиенту к этому моменту уже сформирован.
+    """
+    global executor
+    if not settings.IMAGE_PROCESSING_WORKERS:
+        transaction.on_commit(lambda: process_logged(recipe_id, source))
+        return
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='recipe-images'
+        )
+    transaction.on_commit(
+        lambda: executor.submit(run_job, recipe_id, source)
+    )
+
+
+def validate_upload(file):
+    if file.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError('Изображение слишком большое.')
+    try:
+        Image.open(file)
+    except (UnidentifiedImageError, OSError) as error:
+        raise ValidationError('Файл не является изображением.') from error
+    file.seek(0)
+
+
+def absolute_url(request, url):
+    if request is None or not url:
+        return url
+    return request.build_absolute_uri(url)
+
+
+def thumbnail_urls(recipe, request):
+    return {
+        size: absolute_url(request, default_storage.url(name))
+        for size, name in recipe.image_thumbnails.items()
+    }
@@ -0,0 +1,89 @@
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+from .cache import get_version
+from .metrics import record_cache
+
+
+def trigrams(value):
+    value = f'  {value} '
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class IngredientSearchIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Сначала ищет совпадения по началу названия без учета регистра, затем
+    по подстроке и, если результатов все еще мало, по похожести триграмм.
+    Индекс перестраивается при смене версии 'ingredients'.
+    """
+
+    min_similarity = 0.4
+
+    def __init__(self):
+        self.version = None
+        self.snapshot = ([], [], {})
+        self.lock = threading.Lock()
+
+    def build(self):
+        entries = sorted(
+            (name.lower(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        keys = [entry[0] for entry in entries]
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in entries
+        ]
+        postings = defaultdict(list)
+        for position, key in enumerate(keys):
+            for trigram in trigrams(key):
+                postings[trigram].append(position)
+        return keys, items, dict(postings)
+
+    def get_snapshot(self):
+        version = get_version('ingredients')
+        record_cache('ingredient_index', hit=version == self.version)
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.snapshot = self.build()
+                    self.version = version
+        return self.snapshot
+
+    def search(self, query, limit=None):
+        keys, items, postings = self.get_snapshot()
+        limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+        query = query.strip().lower()
+        found = []
+        position = bisect_left(keys, query)
+        while (position < len(keys) and len(found) < limit
+               and keys[position].startswith(query)):
+            found.append(position)
+            position += 1
+        if len(found) < limit:
+            found.extend(
+                position for position, key in enumerate(keys)
+                if query in key and not key.startswith(query)
+            )
+        if len(found) < limit and len(query) >= 3:
+            query_trigrams = trigrams(query)
+            matched = set(found)
+            scores = Counter()
+            for trigram in query_trigrams:
+                scores.update(postings.get(trigram, ()))
+            found.extend(
+                position for position, score in scores.most_common()
+                if position not in matched
+                and score / len(query_trigrams) >= self.min_similarity
+            )
+        return [items[position] for position in found[:limit]]
+
+
+ingredient_index = IngredientSearchIndex()
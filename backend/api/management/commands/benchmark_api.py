@@ -0,0 +1,316 @@
+import csv
+import json
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+from collections import defaultdict
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from rest_framework.test import APIClient
+
+from recipes.models import (Favourite, FeedEntry, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCartTotal,
+                            ShoppingList, Tag)
+from users.models import Follow, User
+
+DEFAULT_BUDGET = Path(__file__).resolve().parent.parent.parent / (
+    'benchmark_budget.json'
+)
+DEFAULT_INGREDIENTS = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+
+
+class Command(BaseCommand):
+    help = ('Замер задержки, числа запросов и памяти для эндпоинтов API '
+            'на синтетических данных во временной базе данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--ingredients',
+            help=('CSV файл с ингредиентами, по умолчанию '
+                  f'{DEFAULT_INGREDIENTS}, а без него - синтетические'),
+        )
+        parser.add_argument(
+            '--budget',
+            default=str(DEFAULT_BUDGET),
+            help='JSON файл с допустимыми значениями метрик',
+        )
+        parser.add_argument(
+            '--output',
+            help='Сохранить результаты в JSON файл',
+        )
+
+    def handle(self, *args, **options):
+        if options['ingredients'] is None:
+            if DEFAULT_INGREDIENTS.exists():
+                options['ingredients'] = DEFAULT_INGREDIENTS
+        elif not Path(options['ingredients']).is_file():
+            raise CommandError(
+                f'Файл не найден: {options["ingredients"]}'
+            )
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                           serialize=False)
+        try:
+            cache.clear()
+            self.random = random.Random(options['seed'])
+            user = self.seed(options)
+            results = self.run_benchmarks(user, options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.report(results)
+        if options['output']:
+            Path(options['output']).write_text(
+                json.dumps(results, indent=2, ensure_ascii=False)
+            )
+        self.check_budget(results, options['budget'])
+
+    def read_ingredients(self, path):
+        if path is not None:
+            with open(path, encoding='utf-8') as file:
+                return [(row[0], row[1]) for row in csv.reader(file)]
+        return [(f'ингредиент {i}', 'г') for i in range(2000)]
+
+    def seed(self, options):
+        rnd = self.random
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=measurement_unit)
+             for name, measurement_unit in self.read_ingredients(
+                options['ingredients'])),
+            batch_size=999
+        )
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tags = Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in (('Завтрак', '#E26C2D', 'breakfast'),
+                                      ('Обед', '#49B64E', 'dinner'),
+                                      ('Ужин', '#8775D2', 'supper'))
+        )
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        users = User.objects.bulk_create(
+            User(username=f'user{i}', email=f'user{i}@example.com',
+                 first_name='Имя', last_name='Фамилия', password='!')
+            for i in range(options['users'])
+        )
+        user_ids = list(User.objects.values_list('id', flat=True))
+        Recipe.objects.bulk_create(
+            (Recipe(author_id=rnd.choice(user_ids), name=f'Рецепт {i}',
+                    text='Описание рецепта ' * 20,
+                    cooking_time=rnd.randint(1, 120))
+             for i in range(options['recipes'])),
+            batch_size=999
+        )
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        IngredientInRecipe.objects.bulk_create(
+            (IngredientInRecipe(recipe_id=recipe_id, ingredient_id=ingredient,
+                                amount=rnd.randint(1, 500))
+             for recipe_id in recipe_ids
+             for ingredient in rnd.sample(ingredient_ids, 8)),
+            batch_size=999
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+             for recipe_id in recipe_ids
+             for tag_id in rnd.sample(tag_ids, rnd.randint(1, len(tags)))),
+            batch_size=999
+        )
+        for model, size in ((Favourite, 20), (ShoppingList, 10)):
+            model.objects.bulk_create(
+                (model(user_id=user_id, recipe_id=recipe_id)
+                 for user_id in user_ids
+                 for recipe_id in rnd.sample(
+                     recipe_ids, min(size, len(recipe_ids)))),
+                batch_size=999
+            )
+        follows = [
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in rnd.sample(user_ids, min(10, len(user_ids)))
+            if author_id != user_id
+        ]
+        Follow.objects.bulk_create(follows, batch_size=999)
+        recipes_by_author = defaultdict(list)
+        for recipe_id, author_id, pub_date in Recipe.objects.values_list(
+            'id', 'author_id', 'pub_date'
+        ):
+            recipes_by_author[author_id].append((recipe_id, pub_date))
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=follow.user_id, recipe_id=recipe_id,
+                       pub_date=pub_date)
+             for follow in follows
+             for recipe_id, pub_date in recipes_by_author[follow.author_id]),
+            batch_size=999
+        )
+        ShoppingCartTotal.objects.refresh(user_ids)
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_tags_masks', stdout=StringIO())
+        self.stdout.write(
+            f'Данные: пользователей {len(users)}, '
+            f'рецептов {len(recipe_ids)}, '
+            f'ингредиентов {len(ingredient_ids)}'
+        )
+        return User.objects.get(pk=user_ids[0])
+
+    def get_endpoints(self, user):
+        """Эндпоинты: метод, адрес и метод подготовки состояния.
+
+        Подготовительный запрос на тот же адрес выполняется перед каждым
+        замером вне учета, чтобы парные операции (добавить/удалить)
+        всегда начинались из одного состояния.
+        """
+        recipe = Recipe.objects.exclude(author=user).first()
+        author = Follow.objects.filter(user=user).first().author
+        other = User.objects.exclude(pk=user.pk).exclude(
+            following__user=user
+        ).first()
+        return {
+            'recipes_list': ('get', '/api/recipes/?limit=50'),
+            'recipes_list_cursor': (
+                'get', '/api/recipes/?limit=50&pagination=cursor'
+            ),
+            'recipes_list_sparse': (
+                'get', '/api/recipes/?limit=50&fields=id,name,image,'
+                'cooking_time,author&expand=author'
+            ),
+            'recipes_list_deep_page': (
+                'get', '/api/recipes/?limit=6&page=50'
+            ),
+            'recipes_filter_tags': (
+                'get', '/api/recipes/?tags=breakfast&tags=supper'
+            ),
+            'recipes_filter_favorited': (
+                'get', '/api/recipes/?is_favorited=1'
+            ),
+            'recipes_filter_cart': (
+                'get', '/api/recipes/?is_in_shopping_cart=1'
+            ),
+            'recipe_detail': ('get', f'/api/recipes/{recipe.id}/'),
+            'recipes_feed': ('get', '/api/recipes/feed/'),
+            'recipes_cook': (
+                'get', '/api/recipes/cook/?ingredients='
+                + ','.join(map(str, recipe.ingredients.values_list(
+                    'id', flat=True
+                )[:3]))
+            ),
+            'favorite_add': (
+                'post', f'/api/recipes/{recipe.id}/favorite/', 'delete'
+            ),
+            'favorite_remove': (
+                'delete', f'/api/recipes/{recipe.id}/favorite/', 'post'
+            ),
+            'shopping_cart_add': (
+                'post', f'/api/recipes/{recipe.id}/shopping_cart/', 'delete'
+            ),
+            'shopping_cart_remove': (
+                'delete', f'/api/recipes/{recipe.id}/shopping_cart/', 'post'
+            ),
+            'download_shopping_cart': (
+                'get', '/api/recipes/download_shopping_cart/'
+            ),
+            'download_shopping_cart_csv': (
+                'get', '/api/recipes/download_shopping_cart/?format=csv'
+            ),
+            'tags_list': ('get', '/api/tags/'),
+            'ingredients_list': ('get', '/api/ingredients/'),
+            'ingredients_search': ('get', '/api/ingredients/?name=мол'),
+            'users_me': ('get', '/api/users/me/'),
+            'user_detail': ('get', f'/api/users/{author.id}/'),
+            'subscriptions': (
+                'get', '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            'subscribe': (
+                'post', f'/api/users/{other.id}/subscribe/', 'delete'
+            ),
+            'unsubscribe': (
+                'delete', f'/api/users/{other.id}/subscribe/', 'post'
+            ),
+        }
+
+    def request(self, client, method, url):
+        response = getattr(client, method)(url)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {url}: {response.status_code}'
+            )
+        return size
+
+    def run_benchmarks(self, user, iterations):
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        client = APIClient()
+        client.force_authenticate(user)
+        results = {}
+        for name, (method, url, *setup) in self.get_endpoints(user).items():
+            timings = []
+            queries = 0
+            for iteration in range(iterations + 1):
+                if setup:
+                    getattr(client, setup[0])(url)
+                if not iteration:
+                    self.request(client, method, url)
+                    continue
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    size = self.request(client, method, url)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = max(queries, len(context))
+            if setup:
+                getattr(client, setup[0])(url)
+            tracemalloc.start()
+            self.request(client, method, url)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            timings.sort()
+            results[name] = {
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(
+                    timings[max(0, int(len(timings) * 0.95) - 1)], 2
+                ),
+                'queries': queries,
+                'memory_kb': round(peak / 1024, 1),
+                'bytes': size,
+            }
+        return results
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<30}{"p50_ms":>10}{"p95_ms":>10}'
+            f'{"queries":>9}{"memory_kb":>11}{"bytes":>10}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<30}{result["p50_ms"]:>10}{result["p95_ms"]:>10}'
+                f'{result["queries"]:>9}{result["memory_kb"]:>11}'
+                f'{result["bytes"]:>10}'
+            )
+
+    def check_budget(self, results, path):
+        if not Path(path).exists():
+            return
+        budget = json.loads(Path(path).read_text())
+        violations = [
+            f'{name}.{metric}: {results[name][metric]} > {limit}'
+            for name, limits in budget.items() if name in results
+            for metric, limit in limits.items()
+            if results[name][metric] > limit
+        ]
+        if violations:
+            raise CommandError(
+                'Превышен бюджет:\n' + '\n'.join(violations)
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджет соблюден!'))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from api.models import Upload
+
+
+class Command(BaseCommand):
+    help = 'Удаление неиспользованных загрузок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Удалять загрузки старше указанного числа часов',
+        )
+
+    def handle(self, *args, **options):
+        uploads = Upload.objects.filter(
+            created__lt=timezone.now() - timedelta(hours=options['hours'])
+        )
+        count = 0
+        for upload in uploads.iterator():
+            upload.file.delete(save=False)
+            upload.delete()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Удалено загрузок: {count}'))
@@ -0,0 +1,146 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F, QuerySet, Sum
+
+from recipes.models import (Favourite, FeedEntry, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCartTotal,
+                            ShoppingList, Tag)
+from users.models import Follow, User
+
+
+def postgres_seq_scans(plan):
+    """Таблицы, которые план Postgres читает последовательным сканированием"""
+    found = []
+    nodes = [json.loads(plan)[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            found.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', ()))
+    return found
+
+
+def postgres_explain(queryset):
+    """План запроса Postgres в JSON.
+
+    QuerySet.explain(format='json') возвращает repr разобранного psycopg2
+    списка, а не JSON, поэтому EXPLAIN выполняется напрямую.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        return json.dumps(cursor.fetchone()[0], ensure_ascii=False, indent=2)
+
+
+def sqlite_seq_scans(plan):
+    """Таблицы, которые SQLite обходит целиком без индекса"""
+    found = []
+    for line in plan.splitlines():
+        detail = line.split(' ', 3)[-1].strip()
+        if detail.startswith('SCAN ') and ' USING ' not in detail:
+            found.append(detail.split()[1])
+    return found
+
+
+class Command(BaseCommand):
+    help = ('EXPLAIN для типовых запросов API с отчетом о '
+            'последовательном сканировании таблиц')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если найдено сканирование таблиц',
+        )
+        parser.add_argument(
+            '--ignore', nargs='*', default=[Tag._meta.db_table],
+            help='Таблицы, сканирование которых допустимо',
+        )
+
+    def get_queries(self):
+        user = User.objects.order_by('id').first()
+        user_id = user.id if user else 0
+        # Пустой id__in Django не отправляет в базу, и EXPLAIN для него
+        # падает, поэтому на пустой базе подставляется несуществующий id
+        recipe_ids = list(
+            Recipe.objects.values_list('id', flat=True)[:6]
+        ) or [0]
+        cart_recipes = ShoppingList.objects.filter(
+            user_id=user_id
+        ).values('recipe')
+        return {
+            'recipes_page': Recipe.objects.select_related('author')[:6],
+            'recipes_by_author': Recipe.objects.filter(author_id=user_id)[:6],
+            'recipes_by_tags': Recipe.objects.alias(
+                tag_bits=F('tags_mask').bitand(1)
+            ).filter(tag_bits__gt=0)[:6],
+            'recipe_tags': Tag.objects.filter(recipes__in=recipe_ids),
+            'recipe_ingredients': IngredientInRecipe.objects.filter(
+                recipe__in=recipe_ids
+            ).select_related('ingredient'),
+            'ingredients_prefix': Ingredient.objects.filter(
+                name__startswith='мол'
+            ),
+            'subscriptions': User.objects.filter(
+                following__user_id=user_id
+            )[:6],
+            'followers': Follow.objects.filter(author_id=user_id),
+            'favourite_ids': Favourite.objects.filter(
+                user_id=user_id
+            ).values_list('recipe_id', flat=True),
+            'cart_ids': cart_recipes,
+            'cart_totals': IngredientInRecipe.objects.filter(
+                recipe__in=cart_recipes
+            ).values('ingredient').annotate(total=Sum('amount')),
+            'shopping_list': ShoppingCartTotal.objects.filter(
+                user_id=user_id
+            ).values_list(
+                'ingredient__name', 'ingredient__measurement_unit', 'total'
+            ),
+            'feed': FeedEntry.objects.filter(user_id=user_id)[:6],
+        }
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'postgresql':
+            explain = postgres_explain
+            seq_scans = postgres_seq_scans
+        elif connection.vendor == 'sqlite':
+            explain = QuerySet.explain
+            seq_scans = sqlite_seq_scans
+        else:
+            raise CommandError(
+                f'EXPLAIN не поддерживается для {connection.vendor}'
+            )
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # На маленькой базе планировщику дешевле читать таблицы
+                # целиком, поэтому сканирование остается только там, где
+                # нет подходящего индекса
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            problems = self.explain_queries(explain, seq_scans, options)
+        if problems and options['strict']:
+            raise CommandError(
+                f'Запросов с последовательным сканированием: {problems}'
+            )
+
+    def explain_queries(self, explain, seq_scans, options):
+        problems = 0
+        for name, queryset in self.get_queries().items():
+            plan = explain(queryset)
+            tables = [
+                table for table in seq_scans(plan)
+                if table not in options['ignore']
+            ]
+            if tables:
+                problems += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: последовательное сканирование '
+                    f'{", ".join(tables)}'
+                ))
+            else:
+                self.stdout.write(f'{name}: ok')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+        return problems
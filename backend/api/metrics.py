@@ -0,0 +1,83 @@
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса',
+    ['method', 'view', 'status'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_db_queries',
+    'Число SQL-запросов на запрос',
+    ['method', 'view'],
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128),
+)
+RESPONSE_BYTES = Histogram(
+    'foodgram_response_bytes',
+    'Размер тела ответа',
+    ['method', 'view'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests',
+    'Обращения к кешам',
+    ['cache', 'result'],
+)
+SHOPPING_LIST_ITEMS = Histogram(
+    'foodgram_shopping_list_items',
+    'Число ингредиентов в выгрузке списка покупок',
+    ['format'],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500),
+)
+SHOPPING_LIST_BYTES = Histogram(
+    'foodgram_shopping_list_bytes',
+    'Размер выгрузки списка покупок',
+    ['format'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+
+
+def record_cache(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def track_shopping_list(renderer, rows):
+    """Отдает выгрузку списка покупок, считая строки и байты"""
+    items = 0
+
+    def counted():
+        nonlocal items
+        for row in rows:
+            items += 1
+            yield row
+
+    size = 0
+    for chunk in renderer.render_rows(counted()):
+        size += len(chunk)
+        yield chunk
+    SHOPPING_LIST_ITEMS.labels(renderer.format).observe(items)
+    SHOPPING_LIST_BYTES.labels(renderer.format).observe(size)
+
+
+def get_registry():
+    """Реестр метрик текущего процесса или всех воркеров gunicorn.
+
+    В режиме multiprocess (задан PROMETHEUS_MULTIPROC_DIR) значения
+    собираются из файлов всех процессов.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
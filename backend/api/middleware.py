@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES, RESPONSE_BYTES
+
+logger = logging.getLogger('api.profiling')
+
+slow_requests = deque(maxlen=settings.QUERY_PROFILING_BUFFER_SIZE)
+slow_requests_lock = threading.Lock()
+
+query_wrappers = ContextVar('query_wrappers', default=())
+
+
+def get_slow_requests():
+    with slow_requests_lock:
+        return list(slow_requests)
+
+
+@contextmanager
+def record_queries(wrapper):
+    """Подключает wrapper к запросам потока запроса и потоков пула БД.
+
+    Асинхронные представления выполняют запросы в пуле потоков, где
+    execute_wrapper соединения потока запроса их не видит. Поэтому обертка
+    передается и через contextvar, а пул подключает ее в execute_wrappers.
+    """
+    token = query_wrappers.set((*query_wrappers.get(), wrapper))
+    try:
+        with connection.execute_wrapper(wrapper):
+            yield
+    finally:
+        query_wrappers.reset(token)
+
+
+@contextmanager
+def execute_wrappers():
+    """Подключает к соединению потока обертки запросов из контекста"""
+    with ExitStack() as stack:
+        for wrapper in query_wrappers.get():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryRecorder:
+    """Собирает SQL-запросы запроса через connection.execute_wrapper.
+
+    Запросы асинхронного представления приходят из нескольких потоков
+    пула одновременно, поэтому счетчики обновляются под блокировкой.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.lock = threading.Lock()
+        self.view_started = self.view_finished = None
+        self.view_db = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.duration += time.perf_counter() - start
+                self.count += 1
+                self.statements[sql] += 1
+
+    def duplicates(self):
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.statements.most_common()
+            if count >= settings.QUERY_PROFILING_DUPLICATE_THRESHOLD
+        ]
+
+
+class QueryProfilingMiddleware:
+    """Профилирует SQL и время обработки запроса.
+
+    Включается настройкой QUERY_PROFILING. Сериализация в DRF происходит
+    внутри представления, поэтому ее время считается как время
+    представления без учета запросов к БД. Работает и в синхронной, и в
+    асинхронной цепочке middleware; состояние запроса хранится в самом
+    запросе, так как process_view в ASGI выполняется в другом потоке.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder = request._query_recorder = QueryRecorder()
+        start = time.perf_counter()
+        with record_queries(recorder):
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder = request._query_recorder = QueryRecorder()
+        start = time.perf_counter()
+        with record_queries(recorder):
+            response = await self.get_response(request)
+        return self.finish(request, response, recorder, start)
+
+    def finish(self, request, response, recorder, start):
+        finished = time.perf_counter()
+        timings = {'db': recorder.duration, 'total': finished - start}
+        if recorder.view_finished is not None:
+            timings['serialize'] = max(
+                recorder.view_finished - recorder.view_started
+                - recorder.view_db, 0
+            )
+            timings['render'] = finished - recorder.view_finished
+        self.report(request, response, recorder, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recorder = request._query_recorder
+        recorder.view_started = time.perf_counter()
+        recorder.view_db = recorder.duration
+
+    def process_template_response(self, request, response):
+        recorder = request._query_recorder
+        recorder.view_finished = time.perf_counter()
+        recorder.view_db = recorder.duration - recorder.view_db
+        return response
+
+    def report(self, request, response, recorder, timings):
+        size = None if response.streaming else len(response.content)
+        record = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'queries': recorder.count,
+            'duplicates': recorder.duplicates(),
+            'size': size,
+            **{name: round(value * 1000, 2)
+               for name, value in timings.items()},
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={value * 1000:.2f}'
+            + (f';desc="{recorder.count} queries"' if name == 'db' else '')
+            for name, value in timings.items()
+        )
+        slow = record['total'] >= settings.QUERY_PROFILING_SLOW_MS
+        logger.log(
+            logging.WARNING if slow or record['duplicates'] else logging.INFO,
+            json.dumps(record, ensure_ascii=False)
+        )
+        if slow and random.random() < settings.QUERY_PROFILING_SAMPLE_RATE:
+            with slow_requests_lock:
+                slow_requests.append(record)
+
+
+class MetricsMiddleware:
+    """Собирает метрики запросов для эндпоинта /metrics"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with record_queries(queries):
+            response = self.get_response(request)
+        return self.observe(request, response, queries, start)
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with record_queries(queries):
+            response = await self.get_response(request)
+        return self.observe(request, response, queries, start)
+
+    def observe(self, request, response, queries, start):
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if view == 'metrics':
+            return response
+        REQUEST_LATENCY.labels(
+            request.method, view, response.status_code
+        ).observe(duration)
+        REQUEST_QUERIES.labels(request.method, view).observe(queries.count)
+        if not response.streaming:
+            RESPONSE_BYTES.labels(request.method, view).observe(
+                len(response.content)
+            )
+        return response
@@ -0,0 +1,39 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class Upload(models.Model):
+    """Модель загруженного изображения"""
+
+    token = models.UUIDField(
+        'Токен',
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='uploads',
+    )
+    file = models.FileField(
+        'Файл',
+        upload_to='uploads',
+    )
+    created = models.DateTimeField(
+        'Дата загрузки',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Загрузка'
+        verbose_name_plural = 'Загрузки'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.user}: {self.file.name}'
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FileUploadParser
+
+
+class RawUploadParser(FileUploadParser):
+    """Принимает файл в теле запроса, имя файла необязательно"""
+
+    def get_filename(self, stream, media_type, parser_context):
+        return super().get_filename(
+            stream, media_type, parser_context
+        ) or 'upload'
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл и прерывает ее после лимита.
+
+    Тело запроса без multipart отклоняется сразу по Content-Length,
+    остальные загрузки - как только принятые данные превысят
+    IMAGE_MAX_UPLOAD_SIZE.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if (boundary is None
+                and content_length > settings.IMAGE_MAX_UPLOAD_SIZE):
+            self.too_large()
+        return super().handle_raw_input(
+            input_data, META, content_length, boundary, encoding
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_MAX_UPLOAD_SIZE:
+            self.file.close()
+            self.too_large()
+        return super().receive_data_chunk(raw_data, start)
+
+    def too_large(self):
+        raise ValidationError({'file': 'Изображение слишком большое.'})
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .metrics import record_cache
+
+
+def card_key(recipe_id, version):
+    return f'api:recipe_card:{recipe_id}:{version}'
+
+
+def get_recipe_cards(recipes, build):
+    """Карточки рецептов из кеша, собранные одним get_many.
+
+    Ключ содержит версию рецепта из строки страницы, поэтому измененные
+    рецепты просто перестают попадать в кеш. Промахи передаются в build,
+    который возвращает словарь карточек по id рецепта.
+    """
+    keys = {recipe.id: card_key(recipe.id, recipe.version)
+            for recipe in recipes}
+    cached = cache.get_many(list(keys.values()))
+    cards = {}
+    missing = []
+    for recipe in recipes:
+        card = cached.get(keys[recipe.id])
+        record_cache('recipe_cards', hit=card is not None)
+        if card is None:
+            missing.append(recipe)
+        else:
+            cards[recipe.id] = card
+    if missing:
+        built = build(missing)
+        cache.set_many(
+            {keys[recipe_id]: card for recipe_id, card in built.items()},
+            settings.RECIPE_CARD_CACHE_TIMEOUT
+        )
+        cards.update(built)
+    return cards
+
+
+def recipe_cards_changed(recipes):
+    """Сбрасывает карточки рецептов из queryset повышением их версии"""
+    recipes.update(version=F('version') + 1)
+
+
+def delete_recipe_card(recipe):
+    cache.delete(card_key(recipe.id, recipe.version))
@@ -0,0 +1,191 @@
+import heapq
+import os
+import threading
+import uuid
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import IngredientInRecipe
+from .cache import version_path
+from .metrics import record_cache
+
+LOG_NAME = 'recipe_ingredients.log'
+
+
+def create_log(path):
+    """Создает журнал, первая строка которого - его уникальный заголовок"""
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+    try:
+        os.write(descriptor, f'{uuid.uuid4().hex}\n'.encode())
+    finally:
+        os.close(descriptor)
+
+
+def log_path():
+    path = version_path(LOG_NAME)
+    if not os.path.exists(path):
+        os.makedirs(settings.DATA_VERSIONS_DIR, exist_ok=True)
+        try:
+            create_log(path)
+        except FileExistsError:
+            pass
+    return path
+
+
+def append_changes(recipe_ids):
+    """Дописывает id рецептов в общий для всех процессов журнал изменений.
+
+    Запись идет одним write в режиме O_APPEND. Журнал больше
+    RECIPE_COVERAGE_LOG_SIZE заменяется новым с другим заголовком, и
+    процессы, увидев его, перестраивают индекс целиком.
+    """
+    path = log_path()
+    descriptor = os.open(path, os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(descriptor, ''.join(
+            f'{recipe_id}\n' for recipe_id in recipe_ids
+        ).encode())
+        size = os.fstat(descriptor).st_size
+    finally:
+        os.close(descriptor)
+    if size > settings.RECIPE_COVERAGE_LOG_SIZE:
+        rotated = f'{path}.{uuid.uuid4().hex}'
+        create_log(rotated)
+        os.replace(rotated, path)
+
+
+def recipe_ingredients_changed(recipe_ids):
+    """Записывает изменение состава рецептов после коммита транзакции"""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: append_changes(recipe_ids))
+
+
+class RecipeCoverageIndex:
+    """Обратный индекс ингредиент -> рецепты в памяти процесса.
+
+    Списки рецептов хранятся отсортированными массивами array('q'), для
+    каждого рецепта известен набор его ингредиентов. Индекс строится одним
+    запросом, а затем читает журнал изменений и пересобирает списки только
+    для измененных рецептов.
+    """
+
+    def __init__(self):
+        self.log = None
+        self.inode = None
+        self.position = 0
+        self.snapshot = ({}, {}, {})
+        self.lock = threading.Lock()
+
+    def build(self):
+        postings = {}
+        members = {}
+        for ingredient_id, recipe_id in IngredientInRecipe.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id').iterator():
+            recipes = postings.get(ingredient_id)
+            if recipes is None:
+                recipes = postings[ingredient_id] = array('q')
+            if not recipes or recipes[-1] != recipe_id:
+                recipes.append(recipe_id)
+                members.setdefault(recipe_id, set()).add(ingredient_id)
+        sizes = {
+            recipe_id: len(ingredients)
+            for recipe_id, ingredients in members.items()
+        }
+        return postings, sizes, members
+
+    def apply(self, recipe_ids):
+        """Обновляет списки рецептов recipe_ids по их строкам в базе.
+
+        Измененные массивы копируются, поэтому потоки, читающие прежний
+        снимок, не видят промежуточного состояния.
+        """
+        current = {recipe_id: set() for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+            recipe__in=current
+        ).values_list('recipe_id', 'ingredient_id'):
+            current[recipe_id].add(ingredient_id)
+        postings, sizes, members = (dict(part) for part in self.snapshot)
+        copied = set()
+
+        def recipes_for(ingredient_id):
+            if ingredient_id not in copied:
+                copied.add(ingredient_id)
+                postings[ingredient_id] = array(
+                    'q', postings.get(ingredient_id, ())
+                )
+            return postings[ingredient_id]
+
+        for recipe_id, ingredients in current.items():
+            previous = members.get(recipe_id, set())
+            for ingredient_id in previous - ingredients:
+                recipes = recipes_for(ingredient_id)
+                position = bisect_left(recipes, recipe_id)
+                if (position < len(recipes)
+                        and recipes[position] == recipe_id):
+                    recipes.pop(position)
+                if not recipes:
+                    del postings[ingredient_id]
+                    copied.discard(ingredient_id)
+            for ingredient_id in ingredients - previous:
+                recipes = recipes_for(ingredient_id)
+                position = bisect_left(recipes, recipe_id)
+                if (position == len(recipes)
+                        or recipes[position] != recipe_id):
+                    recipes.insert(position, recipe_id)
+            if ingredients:
+                members[recipe_id] = ingredients
+                sizes[recipe_id] = len(ingredients)
+            else:
+                members.pop(recipe_id, None)
+                sizes.pop(recipe_id, None)
+        return postings, sizes, members
+
+    def get_snapshot(self):
+        path = log_path()
+        stat = os.stat(path)
+        fresh = (stat.st_ino, stat.st_size) == (self.inode, self.position)
+        record_cache('recipe_coverage_index', hit=fresh)
+        if fresh:
+            return self.snapshot
+        with self.lock, open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            header = file.readline()
+            if header != self.log:
+                self.snapshot = self.build()
+                self.log, self.position = header, stat.st_size
+            else:
+                file.seek(self.position)
+                data = file.read(stat.st_size - self.position)
+                data = data[:data.rfind(b'\n') + 1]
+                self.position += len(data)
+                if data:
+                    self.snapshot = self.apply(
+                        {int(line) for line in data.split()}
+                    )
+            self.inode = stat.st_ino
+        return self.snapshot
+
+    def top(self, ingredient_ids, limit):
+        """Возвращает (id рецепта, доля покрытия, совпало) по убыванию доли"""
+        postings, sizes, _ = self.get_snapshot()
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        best = heapq.nlargest(
+            limit,
+            matched.items(),
+            key=lambda item: (item[1] / sizes[item[0]], item[1], item[0])
+        )
+        return [
+            (recipe_id, count / sizes[recipe_id], count)
+            for recipe_id, count in best
+        ]
+
+
+coverage_index = RecipeCoverageIndex()
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Favourite, ShoppingList
+from users.models import Follow
+from .cache import bump_version, get_version
+from .metrics import record_cache
+
+FAVOURITES = 'favourites'
+CART = 'cart'
+FOLLOWS = 'follows'
+
+RELATIONS = {
+    FAVOURITES: (Favourite, 'recipe_id'),
+    CART: (ShoppingList, 'recipe_id'),
+    FOLLOWS: (Follow, 'author_id'),
+}
+
+
+def version_name(user_id):
+    """Имя версии связей пользователя.
+
+    Пользователи делят RELATIONS_VERSION_BUCKETS версий по остатку от
+    деления id, поэтому файлов версий не больше этого числа. Изменение
+    связей сбрасывает кеш всех пользователей корзины, а ключи множеств
+    содержат id пользователя и не пересекаются.
+    """
+    return f'relations:{user_id % settings.RELATIONS_VERSION_BUCKETS}'
+
+
+class UserRelations:
+    """Множества id избранного, корзины и подписок пользователя.
+
+    Множества читаются из кеша одним get_many при первом обращении и
+    загружаются из базы только при промахе. Ключи содержат версию
+    пользователя, поэтому устаревшие значения просто перестают читаться.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.version = None
+        self.cached = None
+        self.sets = {}
+
+    def key(self, name):
+        return f'api:relations:{self.user.id}:{name}:{self.version}'
+
+    def get(self, name):
+        if name in self.sets:
+            return self.sets[name]
+        if self.cached is None:
+            self.version = get_version(version_name(self.user.id))
+            self.cached = cache.get_many([self.key(key) for key in RELATIONS])
+        ids = self.cached.get(self.key(name))
+        record_cache('relations', hit=ids is not None)
+        if ids is None:
+            model, field = RELATIONS[name]
+            ids = frozenset(model.objects.filter(
+                user=self.user
+            ).values_list(field, flat=True))
+            cache.set(self.key(name), ids, settings.RELATIONS_CACHE_TIMEOUT)
+        self.sets[name] = ids
+        return ids
+
+
+def get_user_relations(request):
+    """Множества связей текущего пользователя, общие на весь запрос"""
+    relations = getattr(request, 'user_relations', None)
+    if relations is None:
+        relations = request.user_relations = UserRelations(request.user)
+    return relations
+
+
+def has_relation(request, name, pk):
+    if request is None or request.user.is_anonymous:
+        return False
+    return pk in get_user_relations(request).get(name)
+
+
+def relations_changed(*user_ids):
+    """Сбрасывает множества пользователей после коммита транзакции"""
+    def bump():
+        for name in {version_name(user_id) for user_id in user_ids}:
+            bump_version(name)
+    transaction.on_commit(bump)
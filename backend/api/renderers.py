@@ -0,0 +1,112 @@
+import csv
+import os
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Строки списка отдаются генератором render_rows, поэтому ответ можно
+    передавать по частям через StreamingHttpResponse.
+    """
+
+    charset = 'utf-8'
+    title = 'Список покупок'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = [(f'{key}: {value}', '', '') for key, value in data.items()]
+        return b''.join(self.render_rows(data))
+
+    def render_rows(self, rows):
+        raise NotImplementedError
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render_rows(self, rows):
+        yield f'{self.title} \n'.encode(self.charset)
+        for name, measurement_unit, amount in rows:
+            yield f'{name} ({measurement_unit}), {amount}\n'.encode(
+                self.charset
+            )
+
+
+class Echo:
+    """Псевдо-файл, возвращающий записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Единица измерения', 'Количество')
+
+    def render_rows(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.header).encode(self.charset)
+        for row in rows:
+            yield writer.writerow(row).encode(self.charset)
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """Рендерер списка покупок в PDF.
+
+    Документ собирается целиком перед отправкой, его размер ограничен
+    числом ингредиентов в списке.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+
+    def get_font(self):
+        if self.font_name in pdfmetrics.getRegisteredFontNames():
+            return self.font_name
+        if not os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+            return 'Helvetica'
+        pdfmetrics.registerFont(
+            TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT)
+        )
+        return self.font_name
+
+    def render_rows(self, rows):
+        buffer = BytesIO()
+        canvas = Canvas(buffer, pagesize=A4)
+        font = self.get_font()
+        width, height = A4
+        line_height = self.font_size * 1.5
+        canvas.setFont(font, self.font_size + 4)
+        canvas.drawString(self.margin, height - self.margin, self.title)
+        y = height - self.margin - line_height * 2
+        canvas.setFont(font, self.font_size)
+        for name, measurement_unit, amount in rows:
+            if y < self.margin:
+                canvas.showPage()
+                canvas.setFont(font, self.font_size)
+                y = height - self.margin
+            canvas.drawString(
+                self.margin, y, f'{name} ({measurement_unit}), {amount}'
+            )
+            y -= line_height
+        canvas.save()
+        yield buffer.getvalue()
+
+
+SHOPPING_LIST_RENDERERS = [
+    TextShoppingListRenderer, CSVShoppingListRenderer, PDFShoppingListRenderer
+]
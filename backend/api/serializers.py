@@ -1,15 +1,31 @@
-from django.db.models import F
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (BooleanField, F, Manager, Prefetch, Value,
+                              prefetch_related_objects)
 from djoser.serializers import UserCreateSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
-from rest_framework.serializers import (IntegerField, ModelSerializer,
-                                        PrimaryKeyRelatedField,
-                                        SerializerMethodField)
-
-from users.models import Follow, User
-from recipes.models import (Favourite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingList, Tag)
+from rest_framework.serializers import (BaseSerializer, IntegerField,
+                                        ListField, ListSerializer,
+                                        ModelSerializer,
+                                        PrimaryKeyRelatedField, Serializer,
+                                        SerializerMethodField,
+                                        SlugRelatedField)
+
+from users.models import User
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe, Tag,
+                            tags_mask)
+from recipes.signals import recipe_changed
+from .images import (Base64ImagePayloadField, absolute_url,
+                     schedule_recipe_image, thumbnail_urls)
+from .models import Upload
+from .recipe_cards import get_recipe_cards
+from .recipe_coverage import recipe_ingredients_changed
+from .relations import CART, FAVOURITES, FOLLOWS, has_relation
+from .sparse import SparseFieldsetMixin, is_requested
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -20,14 +36,13 @@ class CustomUserCreateSerializer(UserCreateSerializer):
                   'password')
 
 
-class CustomUserSerializer(ModelSerializer):
+class CustomUserSerializer(SparseFieldsetMixin, ModelSerializer):
     is_subscribed = SerializerMethodField(read_only=True)
 
     def get_is_subscribed(self, author):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=user, author=author).exists()
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
+        return has_relation(self.context.get('request'), FOLLOWS, author.id)
 
     class Meta:
         model = User
@@ -43,7 +58,6 @@ class ShortRecipeSerializer(ModelSerializer):
 
 class FollowSerializer(CustomUserSerializer):
     recipes = SerializerMethodField()
-    recipes_count = SerializerMethodField()
 
     class Meta(CustomUserSerializer.Meta):
         fields = (
@@ -58,7 +72,7 @@ class FollowSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, author):
-        recipes = author.recipes.all()
+        recipes = list(author.recipes.all())
         request = self.context.get('request')
         if 'recipes_limit' in request.GET:
             recipes = recipes[:int(request.GET['recipes_limit'])]
@@ -66,8 +80,27 @@ class FollowSerializer(CustomUserSerializer):
                                            read_only=True)
         return serializer.data
 
-    def get_recipes_count(self, author):
-        return author.recipes.count()
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None):
+        queryset = queryset.annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
+        if not is_requested('recipes', fields):
+            return queryset
+        return queryset.prefetch_related(Prefetch(
+            'recipes',
+            queryset=Recipe.objects.only(
+                'id', 'author_id', 'name', 'image', 'cooking_time', 'pub_date'
+            )
+        ))
+
+
+class IdListSerializer(Serializer):
+    ids = ListField(child=IntegerField(min_value=1), allow_empty=False,
+                    max_length=settings.BATCH_MAX_SIZE)
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
 
 
 class TagSerializer(ModelSerializer):
@@ -82,6 +115,12 @@ class IngredientSerializer(ModelSerializer):
         fields = '__all__'
 
 
+class UploadSerializer(ModelSerializer):
+    class Meta:
+        model = Upload
+        fields = ('token', 'created')
+
+
 class IngredientInRecipeCreateSerializer(ModelSerializer):
     id = IntegerField(write_only=True)
     amount = IntegerField(required=True)
@@ -95,11 +134,96 @@ class IngredientInRecipeCreateSerializer(ModelSerializer):
         fields = ('id', 'amount', 'name', 'measurement_unit')
 
 
-class RecipeReadSerializer(ModelSerializer):
+class RecipeAuthorSerializer(ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'first_name', 'last_name', 'email')
+
+
+class RecipeCardSerializer(ModelSerializer):
+    """Общая для всех пользователей часть карточки рецепта.
+
+    Ссылки на изображения относительные, абсолютными их делает
+    RecipeReadSerializer для конкретного запроса.
+    """
     tags = TagSerializer(many=True, read_only=True)
-    author = CustomUserSerializer(read_only=True)
+    author = RecipeAuthorSerializer(read_only=True)
     ingredients = SerializerMethodField()
     image = Base64ImageField()
+    thumbnails = SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'tags', 'author', 'ingredients', 'name', 'image',
+                  'thumbnails', 'text', 'cooking_time')
+
+    def get_thumbnails(self, recipe):
+        return thumbnail_urls(recipe, self.context.get('request'))
+
+    def get_ingredients(self, recipe):
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.ingredient_list.all()
+        ]
+
+
+def build_recipe_cards(recipes):
+    deferred = [
+        recipe.id for recipe in recipes
+        if 'text' in recipe.get_deferred_fields()
+    ]
+    if deferred:
+        texts = dict(Recipe.objects.filter(
+            pk__in=deferred
+        ).values_list('id', 'text'))
+        for recipe in recipes:
+            if recipe.id in texts:
+                recipe.text = texts[recipe.id]
+    prefetch_related_objects(recipes, 'author', 'tags', Prefetch(
+        'ingredient_list',
+        queryset=IngredientInRecipe.objects.select_related(
+            'ingredient'
+        ).order_by('ingredient__name')
+    ))
+    return {
+        recipe.id: dict(RecipeCardSerializer(recipe).data)
+        for recipe in recipes
+    }
+
+
+def load_recipe_cards(recipes):
+    """Прикрепляет к рецептам карточки, подгружая связи только промахов"""
+    cards = get_recipe_cards(recipes, build_recipe_cards)
+    for recipe in recipes:
+        recipe.cached_card = cards[recipe.id]
+    return recipes
+
+
+def card_ids(value):
+    if isinstance(value, list):
+        return [item['id'] for item in value]
+    return value['id']
+
+
+class RecipeListSerializer(ListSerializer):
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        return super().to_representation(load_recipe_cards(recipes))
+
+
+class RecipeReadSerializer(SparseFieldsetMixin, RecipeCardSerializer):
+    """Карточка рецепта из кеша с флагами текущего пользователя"""
+    collapsed_fields = {
+        'author': partial(PrimaryKeyRelatedField, read_only=True),
+        'tags': partial(PrimaryKeyRelatedField, many=True, read_only=True),
+    }
+    author = CustomUserSerializer(read_only=True)
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
 
@@ -107,29 +231,51 @@ class RecipeReadSerializer(ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'thumbnails', 'text', 'cooking_time',
+                  'favourites_count')
+        list_serializer_class = RecipeListSerializer
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=()):
+        """Связи не загружаются: они берутся из карточек в кеше"""
+        if not is_requested('text', fields):
+            queryset = queryset.defer('text')
+        return queryset
 
     def get_is_favorited(self, recipe):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Favourite.objects.filter(user=user, recipe=recipe).exists()
+        return has_relation(self.context.get('request'), FAVOURITES, recipe.id)
 
     def get_is_in_shopping_cart(self, recipe):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return ShoppingList.objects.filter(user=user, recipe=recipe).exists()
-
-    def get_ingredients(self, obj):
-        recipe = obj
-        ingredients = recipe.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredient_list__amount')
-        )
-        return ingredients
+        return has_relation(self.context.get('request'), CART, recipe.id)
+
+    def to_representation(self, recipe):
+        if not hasattr(recipe, 'cached_card'):
+            load_recipe_cards([recipe])
+        card = recipe.cached_card
+        request = self.context.get('request')
+        data = {}
+        for name, field in self.fields.items():
+            if name not in card:
+                data[name] = field.to_representation(
+                    field.get_attribute(recipe)
+                )
+            elif not isinstance(field, BaseSerializer) and (
+                    name in self.collapsed_fields):
+                data[name] = card_ids(card[name])
+            elif name == 'author':
+                data[name] = {**card[name], 'is_subscribed': has_relation(
+                    request, FOLLOWS, recipe.author_id
+                )}
+            elif name == 'image':
+                data[name] = absolute_url(request, card[name])
+            elif name == 'thumbnails':
+                data[name] = {
+                    size: absolute_url(request, url)
+                    for size, url in card[name].items()
+                }
+            else:
+                data[name] = card[name]
+        return data
 
 
 class RecipeCreateUpdateSerializer(ModelSerializer):
@@ -137,12 +283,32 @@ class RecipeCreateUpdateSerializer(ModelSerializer):
                                   queryset=Tag.objects.all())
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientInRecipeCreateSerializer(many=True)
-    image = Base64ImageField()
+    image = Base64ImagePayloadField(required=False)
+    image_upload = SlugRelatedField(slug_field='token', write_only=True,
+                                    required=False,
+                                    queryset=Upload.objects.all())
 
     class Meta:
         model = Recipe
         fields = ('id', 'author', 'name', 'tags', 'ingredients',
-                  'image', 'text', 'cooking_time')
+                  'image', 'image_upload', 'text', 'cooking_time')
+
+    def validate_image_upload(self, value):
+        if value.user != self.context.get('request').user:
+            raise ValidationError(
+                detail='Загрузка не найдена',
+                code=status.HTTP_400_BAD_REQUEST
+            )
+        return value
+
+    def validate(self, data):
+        if not self.partial and not (
+                data.get('image') or data.get('image_upload')):
+            raise ValidationError(
+                detail={'image': 'Нужно добавить изображение'},
+                code=status.HTTP_400_BAD_REQUEST
+            )
+        return data
 
     def validate_tags(self, value):
         if not value:
@@ -182,6 +348,11 @@ class RecipeCreateUpdateSerializer(ModelSerializer):
                 )
         return value
 
+    def pop_image(self, validated_data):
+        upload = validated_data.pop('image_upload', None)
+        payload = validated_data.pop('image', None)
+        return upload or payload
+
     def create_ingredients_amounts(self, ingredients, recipe):
         IngredientInRecipe.objects.bulk_create(
             [IngredientInRecipe(
@@ -190,29 +361,118 @@ class RecipeCreateUpdateSerializer(ModelSerializer):
                 amount=ingredient['amount']
             ) for ingredient in ingredients]
         )
+        recipe_ingredients_changed([recipe.pk])
 
     def create(self, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients')
+        image = self.pop_image(validated_data)
         recipe = Recipe.objects.create(
             **validated_data
         )
         recipe.tags.set(tags)
         self.create_ingredients_amounts(recipe=recipe,
                                         ingredients=ingredients)
+        schedule_recipe_image(recipe.id, image)
         return recipe
 
+    def update_tags(self, instance, tags):
+        """Добавляет и удаляет только изменившиеся теги рецепта.
+
+        Записи промежуточной модели меняются напрямую, без m2m_changed,
+        поэтому маска тегов пересчитывается здесь же.
+        """
+        current = set(instance.tags.values_list('id', flat=True))
+        new = {tag.id for tag in tags}
+        through = Recipe.tags.through
+        through.objects.bulk_create([
+            through(recipe_id=instance.id, tag_id=tag_id)
+            for tag_id in new - current
+        ])
+        through.objects.filter(
+            recipe_id=instance.id, tag_id__in=current - new
+        ).delete()
+        instance.tags_mask = tags_mask(new)
+        return new - current, current - new
+
+    def update_ingredients(self, instance, ingredients):
+        """Одна вставка, одно обновление и одно удаление ингредиентов"""
+        current = {
+            item.ingredient_id: item
+            for item in instance.ingredient_list.all()
+        }
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        added = amounts.keys() - current.keys()
+        removed = current.keys() - amounts.keys()
+        changed = [
+            item for ingredient_id, item in current.items()
+            if ingredient_id in amounts
+            and item.amount != amounts[ingredient_id]
+        ]
+        for item in changed:
+            item.amount = amounts[item.ingredient_id]
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe=instance,
+                ingredient_id=ingredient_id,
+                amount=amounts[ingredient_id]
+            ) for ingredient_id in added
+        ])
+        IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        instance.ingredient_list.filter(ingredient_id__in=removed).delete()
+        return added, removed, {item.ingredient_id for item in changed}
+
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
-        ingredients = validated_data.pop('ingredients')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients_amounts(recipe=instance,
-                                        ingredients=ingredients)
-        return super().update(instance, validated_data)
+        ingredients = validated_data.pop('ingredients', None)
+        image = self.pop_image(validated_data)
+        changes = {
+            'fields': {
+                name for name, value in validated_data.items()
+                if getattr(instance, name) != value
+            },
+            'tags_added': set(),
+            'tags_removed': set(),
+            'ingredients_added': set(),
+            'ingredients_removed': set(),
+            'ingredients_changed': set(),
+        }
+        with transaction.atomic():
+            if tags is not None:
+                changes['tags_added'], changes['tags_removed'] = (
+                    self.update_tags(instance, tags)
+                )
+            if ingredients is not None:
+                (changes['ingredients_added'],
+                 changes['ingredients_removed'],
+                 changes['ingredients_changed']) = self.update_ingredients(
+                    instance, ingredients
+                )
+            if any(changes.values()):
+                values = {
+                    name: validated_data[name] for name in changes['fields']
+                }
+                if tags is not None:
+                    values['tags_mask'] = instance.tags_mask
+                for name, value in values.items():
+                    setattr(instance, name, value)
+                Recipe.objects.filter(pk=instance.pk).update(
+                    version=F('version') + 1, **values
+                )
+                recipe_changed.send(
+                    sender=Recipe, instance=instance, **changes
+                )
+        if image:
+            schedule_recipe_image(instance.id, image)
+        return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = RecipeReadSerializer.setup_eager_loading(
+            Recipe.objects.all()
+        ).get(pk=instance.pk)
         return RecipeReadSerializer(instance, context=context).data
@@ -0,0 +1,82 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.signals import recipe_changed
+from users.models import User
+from .cache import bump_version
+from .recipe_cards import delete_recipe_card, recipe_cards_changed
+from .recipe_coverage import recipe_ingredients_changed
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(**kwargs):
+    bump_version('ingredients')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(**kwargs):
+    bump_version('tags')
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def recipe_ingredients_saved(instance, **kwargs):
+    recipe_ingredients_changed([instance.recipe_id])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_ingredients_deleted(instance, **kwargs):
+    recipe_ingredients_changed([instance.pk])
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_recipes_changed(instance, **kwargs):
+    """Строки ингредиента удаляются каскадом без сигналов"""
+    recipe_ingredients_changed(
+        instance.ingredient_list.values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(recipe_changed)
+def recipe_ingredients_updated(instance, ingredients_added,
+                               ingredients_removed, **kwargs):
+    """Версия карточки уже повышена тем же UPDATE, что сохранил рецепт"""
+    if ingredients_added or ingredients_removed:
+        recipe_ingredients_changed([instance.pk])
+
+
+AUTHOR_CARD_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, created, **kwargs):
+    if not created:
+        recipe_cards_changed(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    delete_recipe_card(instance)
+
+
+@receiver(post_save, sender=User)
+def author_saved(instance, created, update_fields, **kwargs):
+    if created or update_fields and not AUTHOR_CARD_FIELDS & update_fields:
+        return
+    recipe_cards_changed(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_cards_changed(instance, created=False, **kwargs):
+    if not created:
+        recipe_cards_changed(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_cards_changed(instance, created=False, **kwargs):
+    if not created:
+        recipe_cards_changed(Recipe.objects.filter(ingredients=instance))
@@ -0,0 +1,46 @@
+from rest_framework.serializers import ListSerializer
+
+
+def sparse_fieldset(request):
+    """Разбирает ?fields= и ?expand= в пару (поля или None, связи)"""
+    if request is None:
+        return None, set()
+    fields = request.query_params.get('fields')
+    expand = request.query_params.get('expand', '')
+    if fields is not None:
+        fields = set(filter(None, fields.split(',')))
+    return fields, set(filter(None, expand.split(',')))
+
+
+def is_requested(name, fields):
+    return fields is None or name in fields
+
+
+class SparseFieldsetMixin:
+    """Оставляет в ответе только запрошенные через ?fields= поля.
+
+    Связи из collapsed_fields при явном списке полей отдаются
+    идентификаторами, пока не указаны в ?expand=. Вложенные сериализаторы
+    параметры запроса не учитывают.
+    """
+    collapsed_fields = {}
+
+    def is_top_level(self):
+        return self.parent is None or (
+            isinstance(self.parent, ListSerializer)
+            and self.parent.parent is None
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_top_level():
+            return fields
+        requested, expand = sparse_fieldset(self.context.get('request'))
+        if requested is None:
+            return fields
+        for name in list(fields):
+            if name not in requested:
+                del fields[name]
+            elif name in self.collapsed_fields and name not in expand:
+                fields[name] = self.collapsed_fields[name]()
+        return fields
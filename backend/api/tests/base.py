@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Tag
+from users.models import User
+
+IMAGE = ('data:image/gif;base64,'
+         'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+
+class ApiTestMixin:
+    """Пользователи, теги и ингредиенты для тестов API.
+
+    Изображения и версии данных пишутся во временные каталоги класса
+    тестов, а не в MEDIA_ROOT и DATA_VERSIONS_DIR проекта.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.temp_settings = override_settings(
+            MEDIA_ROOT=f'{cls.temp_dir}/media',
+            DATA_VERSIONS_DIR=f'{cls.temp_dir}/versions',
+        )
+        cls.temp_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.temp_settings.disable()
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    @classmethod
+    def create_fixtures(cls):
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(5)
+        ]
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com',
+                password='password', first_name='Имя', last_name='Фамилия'
+            )
+            for i in range(3)
+        ]
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    def create_recipe(self, user, tags=None, ingredients=None, amounts=None,
+                      **data):
+        tags = self.tags if tags is None else tags
+        ingredients = self.ingredients if ingredients is None else ingredients
+        amounts = amounts or [1] * len(ingredients)
+        payload = {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5,
+            'image': IMAGE, 'tags': [tag.id for tag in tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in zip(ingredients, amounts)
+            ],
+            **data,
+        }
+        response = self.client_for(user).post(
+            '/api/recipes/', payload, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+
+@override_settings(IMAGE_PROCESSING_WORKERS=0)
+class ApiTestCase(ApiTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+
+    def setUp(self):
+        cache.clear()
+
+
+@override_settings(IMAGE_PROCESSING_WORKERS=0)
+class ThreadedTestCase(ApiTestMixin, TransactionTestCase):
+    """Тесты, в которых к базе обращаются другие потоки.
+
+    Потоки не видят тестовую базу SQLite в памяти, поэтому такие тесты
+    выполняются только на файловой базе или Postgres.
+    """
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Потоки не разделяют тестовую базу SQLite в памяти')
+        cache.clear()
+        self.create_fixtures()
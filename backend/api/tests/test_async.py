@@ -0,0 +1,117 @@
+import json
+import threading
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, override_settings
+from prometheus_client import REGISTRY
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.async_views import (DB_WORKERS, close_db_connections, db_executor,
+                             run_query)
+from .base import ThreadedTestCase
+
+
+class AsyncReadTests(ThreadedTestCase):
+    """Асинхронные эндпоинты отвечают так же, как синхронные"""
+
+    def setUp(self):
+        super().setUp()
+        for number in range(8):
+            self.create_recipe(
+                self.users[0], tags=self.tags[:2],
+                ingredients=self.ingredients[:3], name=f'Рецепт {number}'
+            )
+        self.client = self.token_client(
+            Token.objects.create(user=self.users[1]).key
+        )
+        self.addCleanup(close_db_connections)
+
+    def token_client(self, key):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return client
+
+    def test_responses_match_sync_views(self):
+        recipe = self.client.get('/api/recipes/').json()['results'][0]['id']
+        self.client.post(f'/api/recipes/{recipe}/favorite/')
+        self.client.post(f'/api/users/{self.users[0].id}/subscribe/')
+        for url in (
+            'recipes/', 'recipes/?page=2&limit=3', f'recipes/{recipe}/',
+            'recipes/?fields=id,author,tags',
+            'recipes/?fields=id,author&expand=author', 'recipes/?tags=tag0',
+            'recipes/?is_favorited=1', 'tags/', 'ingredients/',
+            'ingredients/?name=инг', 'users/subscriptions/?recipes_limit=2',
+        ):
+            with self.subTest(url=url):
+                expected = self.client.get(f'/api/{url}')
+                response = self.client.get(f'/api/async/{url}')
+                self.assertEqual(expected.status_code, 200)
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(json.loads(
+                    response.content.decode().replace('/api/async/', '/api/')
+                ), expected.json())
+
+    def test_errors(self):
+        anonymous = APIClient()
+        for url, status in (
+            ('/api/async/recipes/999/', 404),
+            ('/api/async/recipes/?page=9', 404),
+            ('/api/async/users/subscriptions/', 401),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(anonymous.get(url).status_code, status)
+        self.assertEqual(
+            self.token_client('unknown').get('/api/async/tags/').status_code,
+            401
+        )
+        self.assertEqual(anonymous.post('/api/async/tags/').status_code, 405)
+
+    def test_connections_are_reused(self):
+        barrier = threading.Barrier(DB_WORKERS)
+
+        def connect():
+            barrier.wait()
+            connection.ensure_connection()
+
+        for future in [db_executor.submit(run_query, connect)
+                       for _ in range(DB_WORKERS)]:
+            future.result()
+        created = []
+
+        def count(sender, connection, **kwargs):
+            created.append(connection)
+
+        connection_created.connect(count)
+        self.addCleanup(connection_created.disconnect, count)
+        for _ in range(3):
+            self.assertEqual(
+                self.client.get('/api/async/recipes/').status_code, 200
+            )
+        self.assertEqual(created, [])
+
+    def observed_queries(self):
+        return REGISTRY.get_sample_value(
+            'foodgram_request_db_queries_sum',
+            {'method': 'GET', 'view': 'api:api.async_views.recipe_list'}
+        ) or 0
+
+    @override_settings(QUERY_PROFILING=True, QUERY_PROFILING_SLOW_MS=0)
+    def test_queries_in_pool_are_counted(self):
+        for name, get in (('wsgi', APIClient().get),
+                          ('asgi', async_to_sync(AsyncClient().get))):
+            with self.subTest(handler=name):
+                observed = self.observed_queries()
+                with self.assertLogs('api.profiling', 'INFO') as logs:
+                    response = get('/api/async/recipes/')
+                self.assertEqual(response.status_code, 200)
+                queries = json.loads(logs.records[-1].getMessage())['queries']
+                self.assertGreater(queries, 0)
+                self.assertIn(
+                    f'desc="{queries} queries"', response['Server-Timing']
+                )
+                self.assertEqual(
+                    self.observed_queries() - observed, queries
+                )
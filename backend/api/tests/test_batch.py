@@ -0,0 +1,80 @@
+from unittest import mock
+
+from recipes.models import Favourite, Recipe
+from users.models import Follow, User
+from .base import ApiTestCase
+
+
+class BatchRelationTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.users[1])
+        self.recipes = [
+            self.create_recipe(self.users[0])['id'] for _ in range(3)
+        ]
+
+    def batch(self, method, url, ids):
+        response = getattr(self.client, method)(
+            url, {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return {
+            result['id']: result['status']
+            for result in response.json()['results']
+        }
+
+    def favourites_counts(self):
+        return list(Recipe.objects.filter(id__in=self.recipes).order_by(
+            'id'
+        ).values_list('favourites_count', flat=True))
+
+    def check_favourites(self):
+        first, second, third = self.recipes
+        Favourite.objects.create(user=self.users[1], recipe_id=first)
+        Recipe.objects.filter(pk=first).update(favourites_count=1)
+        url = '/api/recipes/batch/favorite/'
+        self.assertEqual(self.batch('post', url, [first, second, 999]), {
+            first: 'exists', second: 'created', 999: 'not_found'
+        })
+        self.assertEqual(self.batch('post', url, [second, third]), {
+            second: 'exists', third: 'created'
+        })
+        self.assertEqual(self.favourites_counts(), [1, 1, 1])
+        self.assertEqual(self.batch('delete', url, [first, third, 999]), {
+            first: 'deleted', third: 'deleted', 999: 'not_found'
+        })
+        self.assertEqual(self.batch('delete', url, [first]), {
+            first: 'not_found'
+        })
+        self.assertEqual(self.favourites_counts(), [0, 1, 0])
+        self.assertEqual(list(Favourite.objects.values_list(
+            'recipe_id', flat=True
+        )), [second])
+
+    def test_favourites(self):
+        self.check_favourites()
+
+    def test_favourites_without_returning(self):
+        with mock.patch('api.batch.can_return_rows', return_value=False):
+            self.check_favourites()
+
+    def test_subscriptions(self):
+        url = '/api/users/batch/subscribe/'
+        author, user = self.users[0], self.users[1]
+        self.assertEqual(self.batch('post', url, [author.id, user.id]), {
+            author.id: 'created', user.id: 'not_found'
+        })
+        self.assertEqual(self.batch('post', url, [author.id]), {
+            author.id: 'exists'
+        })
+        self.assertEqual(
+            User.objects.get(pk=author.pk).followers_count, 1
+        )
+        self.assertEqual(self.batch('delete', url, [author.id]), {
+            author.id: 'deleted'
+        })
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            User.objects.get(pk=author.pk).followers_count, 0
+        )
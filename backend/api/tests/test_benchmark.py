@@ -0,0 +1,15 @@
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from api.management.commands.benchmark_api import DEFAULT_INGREDIENTS
+
+
+class BenchmarkOptionsTests(SimpleTestCase):
+
+    def test_default_ingredients_at_repository_root(self):
+        self.assertEqual(DEFAULT_INGREDIENTS.parent.name, 'data')
+        self.assertTrue(DEFAULT_INGREDIENTS.is_file())
+
+    def test_missing_ingredients_file(self):
+        with self.assertRaisesMessage(CommandError, 'missing.csv'):
+            call_command('benchmark_api', ingredients='missing.csv')
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+
+from api.cache import get_version
+from .base import ApiTestCase
+
+
+class DataVersionTests(ApiTestCase):
+
+    def test_version_bumped_by_another_process_is_visible(self):
+        before = get_version('ingredients')
+        subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c',
+             "from api.cache import bump_version; "
+             "bump_version('ingredients')"],
+            cwd=settings.BASE_DIR, check=True,
+            env={**os.environ, 'DEBUG': str(settings.DEBUG),
+                 'DATA_VERSIONS_DIR': settings.DATA_VERSIONS_DIR},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.assertGreater(get_version('ingredients'), before)
+
+    def test_load_ingredients_refreshes_cached_responses(self):
+        client = self.client_for()
+        self.assertEqual(len(client.get('/api/ingredients/').json()), 5)
+        self.assertEqual(client.get('/api/ingredients/?name=соль').json(), [])
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', encoding='utf-8', delete=False
+        ) as file:
+            file.write('соль,г\n')
+        self.addCleanup(os.remove, file.name)
+        call_command('load_ingredients', file.name, stdout=StringIO())
+        self.assertEqual(len(client.get('/api/ingredients/').json()), 6)
+        self.assertEqual(
+            [item['name'] for item in client.get(
+                '/api/ingredients/?name=соль'
+            ).json()],
+            ['соль']
+        )
+
+
+class ResponseCacheTests(ApiTestCase):
+
+    def test_cached_response_without_queries(self):
+        client = self.client_for()
+        first = client.get('/api/tags/')
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+        with self.assertNumQueries(0):
+            second = client.get('/api/tags/')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_requests(self):
+        client = self.client_for()
+        response = client.get('/api/ingredients/')
+        with self.assertNumQueries(0):
+            not_modified = client.get(
+                '/api/ingredients/', HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(not_modified.status_code, 304)
+        with self.assertNumQueries(0):
+            not_modified = client.get(
+                '/api/ingredients/',
+                HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_etag_changes_on_save(self):
+        client = self.client_for()
+        for url, instance in (('/api/tags/', self.tags[0]),
+                              ('/api/ingredients/', self.ingredients[0])):
+            with self.subTest(url=url):
+                etag = client.get(url)['ETag']
+                instance.name = f'{instance.name} новое'
+                instance.save()
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertIn(instance.name, response.content.decode())
@@ -0,0 +1,56 @@
+from recipes.models import Recipe
+from .base import ApiTestCase
+
+
+class RecipeCardTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.users[0]
+        self.client = self.client_for(self.users[1])
+        self.recipe = self.create_recipe(
+            self.author, tags=self.tags[:1],
+            ingredients=self.ingredients[:1]
+        )['id']
+        self.url = f'/api/recipes/{self.recipe}/'
+
+    def card(self):
+        return self.client.get(self.url).json()
+
+    def test_expanded_author_comes_from_card(self):
+        self.card()
+        with self.assertNumQueries(1):
+            recipe = self.client.get(
+                f'{self.url}?fields=id,author&expand=author'
+            ).json()
+        self.assertEqual(recipe['author']['username'], self.author.username)
+
+    def test_cards_follow_related_changes(self):
+        self.card()
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        self.assertEqual(self.card()['author']['first_name'], 'Новое имя')
+        self.tags[0].name = 'Новый тег'
+        self.tags[0].save()
+        self.assertEqual(self.card()['tags'][0]['name'], 'Новый тег')
+        self.ingredients[0].measurement_unit = 'кг'
+        self.ingredients[0].save()
+        self.assertEqual(
+            self.card()['ingredients'][0]['measurement_unit'], 'кг'
+        )
+        self.client_for(self.author).patch(
+            self.url, {'name': 'Новое название'}, format='json'
+        )
+        self.assertEqual(self.card()['name'], 'Новое название')
+
+    def test_stale_save_does_not_reuse_version(self):
+        stale = Recipe.objects.get(pk=self.recipe)
+        self.client_for(self.author).patch(
+            self.url, {'name': 'Новое название'}, format='json'
+        )
+        self.assertEqual(self.card()['name'], 'Новое название')
+        stale.cooking_time = 10
+        stale.save()
+        card = self.card()
+        self.assertEqual(card['name'], 'Рецепт')
+        self.assertEqual(card['cooking_time'], 10)
@@ -0,0 +1,74 @@
+import threading
+
+from django.db import connection
+
+from recipes.models import Favourite, Recipe, ShoppingList
+from users.models import Follow
+from .base import ThreadedTestCase
+
+THREADS = 8
+
+
+class ConcurrentToggleTests(ThreadedTestCase):
+    """Одновременные запросы одного пользователя к одной связи"""
+
+    def setUp(self):
+        super().setUp()
+        self.author, self.user = self.users[:2]
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=5, image='recipes/images/image.jpg'
+        )
+
+    def concurrently(self, method, url):
+        """Отправляет THREADS одинаковых запросов разом, коды ответов"""
+        barrier = threading.Barrier(THREADS)
+        codes = []
+
+        def request():
+            client = self.client_for(self.user)
+            try:
+                barrier.wait()
+                codes.append(getattr(client, method)(url).status_code)
+            except Exception as error:
+                codes.append(repr(error))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=request) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(codes, key=str)
+
+    def check_toggle(self, url, created, removed, missing):
+        self.assertEqual(
+            self.concurrently('post', url),
+            [created] + [400] * (THREADS - 1)
+        )
+        self.assertEqual(
+            self.concurrently('delete', url),
+            [removed] + [missing] * (THREADS - 1)
+        )
+
+    def test_favorite(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        self.check_toggle(url, 200, 200, 400)
+        self.assertFalse(Favourite.objects.exists())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favourites_count, 0)
+
+    def test_shopping_cart(self):
+        url = f'/api/recipes/{self.recipe.id}/shopping_cart/'
+        self.check_toggle(url, 201, 204, 404)
+        self.assertFalse(ShoppingList.objects.exists())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.in_carts_count, 0)
+
+    def test_subscribe(self):
+        url = f'/api/users/{self.author.id}/subscribe/'
+        self.check_toggle(url, 201, 204, 404)
+        self.assertFalse(Follow.objects.exists())
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
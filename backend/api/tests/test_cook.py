@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import override_settings
+
+from api.recipe_coverage import (RecipeCoverageIndex, append_changes,
+                                 coverage_index)
+from .base import ApiTestCase
+
+
+class CookTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        versions = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, versions, ignore_errors=True)
+        settings = override_settings(DATA_VERSIONS_DIR=versions)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = self.client_for(self.users[0])
+        self.ids = [ingredient.id for ingredient in self.ingredients]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a, self.b, self.c = (
+                self.create_recipe(
+                    self.users[0], ingredients=ingredients
+                )['id']
+                for ingredients in (
+                    self.ingredients[:2], self.ingredients[:4],
+                    self.ingredients[4:]
+                )
+            )
+
+    def cook(self, *ingredients, **params):
+        response = self.client_for().get('/api/recipes/cook/', {
+            'ingredients': ','.join(map(str, ingredients)), **params
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        return [
+            (recipe['id'], recipe['coverage'], recipe['matched_ingredients'])
+            for recipe in response.json()['results']
+        ]
+
+    def test_ranking(self):
+        self.assertEqual(
+            self.cook(*self.ids[:3]), [(self.a, 1.0, 2), (self.b, 0.75, 3)]
+        )
+        self.assertEqual(
+            self.cook(self.ids[4], self.ids[0], limit=1), [(self.c, 1.0, 1)]
+        )
+        for query in ('?ingredients=x', ''):
+            self.assertEqual(self.client_for().get(
+                f'/api/recipes/cook/{query}'
+            ).status_code, 400)
+
+    def test_changes_are_applied_without_rebuild(self):
+        self.assertEqual(self.cook(self.ids[4]), [(self.c, 1.0, 1)])
+        with mock.patch.object(
+            RecipeCoverageIndex, 'build', side_effect=AssertionError
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(f'/api/recipes/{self.a}/', {
+                    'ingredients': [
+                        {'id': self.ids[4], 'amount': 1},
+                        {'id': self.ids[3], 'amount': 1},
+                    ]
+                }, format='json')
+            self.assertEqual(
+                self.cook(self.ids[4]), [(self.c, 1.0, 1), (self.a, 0.5, 1)]
+            )
+            self.assertEqual(self.cook(self.ids[0]), [(self.b, 0.25, 1)])
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f'/api/recipes/{self.c}/')
+            self.assertEqual(self.cook(self.ids[4]), [(self.a, 0.5, 1)])
+            self.assertNotIn(self.c, coverage_index.snapshot[1])
+
+    def test_log_from_other_process(self):
+        self.cook(self.ids[0])
+        self.ingredients[0].ingredient_list.filter(recipe=self.b).delete()
+        append_changes([self.b])
+        self.assertEqual(
+            self.cook(self.ids[0]), [(self.a, 0.5, 1)]
+        )
+
+    @override_settings(RECIPE_COVERAGE_LOG_SIZE=0)
+    def test_rotated_log_rebuilds_index(self):
+        self.cook(self.ids[0])
+        self.ingredients[0].ingredient_list.filter(recipe=self.b).delete()
+        with mock.patch.object(
+            RecipeCoverageIndex, 'apply', side_effect=AssertionError
+        ):
+            append_changes([self.b])
+            self.assertEqual(
+                self.cook(self.ids[0]), [(self.a, 0.5, 1)]
+            )
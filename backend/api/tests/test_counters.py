@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from recipes.models import Favourite, Recipe, ShoppingList
+from users.models import Follow, User
+from .base import ApiTestCase
+
+
+class CounterTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_id = self.create_recipe(self.users[0])['id']
+        self.author = self.client_for(self.users[0])
+        self.reader = self.client_for(self.users[1])
+
+    def counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe_id)
+        author = User.objects.get(pk=self.users[0].pk)
+        return (recipe.favourites_count, recipe.in_carts_count,
+                author.recipes_count, author.followers_count)
+
+    def test_api_keeps_counters(self):
+        self.reader.post(f'/api/recipes/{self.recipe_id}/favorite/')
+        self.reader.post(f'/api/recipes/{self.recipe_id}/shopping_cart/')
+        self.reader.post(f'/api/users/{self.users[0].id}/subscribe/')
+        self.assertEqual(self.counters(), (1, 1, 1, 1))
+        self.reader.delete(f'/api/recipes/{self.recipe_id}/favorite/')
+        self.reader.delete(f'/api/users/{self.users[0].id}/subscribe/')
+        self.assertEqual(self.counters(), (0, 1, 1, 0))
+
+    def test_removing_uncounted_relations(self):
+        Favourite.objects.create(user=self.users[1], recipe_id=self.recipe_id)
+        ShoppingList.objects.create(
+            user=self.users[1], recipe_id=self.recipe_id
+        )
+        Follow.objects.create(user=self.users[1], author=self.users[0])
+        User.objects.filter(pk=self.users[0].pk).update(recipes_count=0)
+        for url, expected in (
+            (f'/api/recipes/{self.recipe_id}/favorite/', 200),
+            (f'/api/recipes/{self.recipe_id}/shopping_cart/', 204),
+            (f'/api/users/{self.users[0].id}/subscribe/', 204),
+        ):
+            self.assertEqual(self.reader.delete(url).status_code, expected)
+        response = self.author.delete(f'/api/recipes/{self.recipe_id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            User.objects.get(pk=self.users[0].pk).recipes_count, 0
+        )
+
+    def test_batch_removal_of_uncounted_relations(self):
+        Favourite.objects.create(user=self.users[1], recipe_id=self.recipe_id)
+        response = self.reader.delete(
+            '/api/recipes/batch/favorite/', {'ids': [self.recipe_id]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counters()[0], 0)
+
+    def test_save_does_not_overwrite_counters(self):
+        author = User.objects.get(pk=self.users[0].pk)
+        recipe = Recipe.objects.get(pk=self.recipe_id)
+        self.reader.post(f'/api/recipes/{self.recipe_id}/favorite/')
+        self.reader.post(f'/api/users/{self.users[0].id}/subscribe/')
+        author.first_name = 'Другое'
+        author.save()
+        recipe.cooking_time = 10
+        recipe.save()
+        self.assertEqual(self.counters(), (1, 0, 1, 1))
+        self.assertEqual(
+            User.objects.get(pk=self.users[0].pk).first_name, 'Другое'
+        )
+
+    def test_rebuild_counters(self):
+        Favourite.objects.create(user=self.users[1], recipe_id=self.recipe_id)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(self.counters(), (1, 0, 1, 0))
+        call_command('rebuild_counters', '--check', stdout=StringIO())
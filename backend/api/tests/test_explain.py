@@ -0,0 +1,65 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from api.management.commands.explain_queries import (Command,
+                                                     postgres_seq_scans,
+                                                     sqlite_seq_scans)
+from recipes.models import Recipe
+
+
+class SeqScanParserTests(TestCase):
+
+    def test_sqlite_plan(self):
+        plan = ('2 0 0 SCAN recipes_tag\n'
+                '3 0 0 SEARCH recipes_recipe USING INDEX recipe_idx (id=?)\n'
+                '4 0 0 SCAN users_follow USING COVERING INDEX follow_idx\n'
+                '5 0 0 SCAN recipes_favourite')
+        self.assertEqual(
+            sqlite_seq_scans(plan), ['recipes_tag', 'recipes_favourite']
+        )
+
+    def test_postgres_plan(self):
+        plan = json.dumps([{'Plan': {
+            'Node Type': 'Nested Loop',
+            'Plans': [
+                {'Node Type': 'Seq Scan', 'Relation Name': 'recipes_tag'},
+                {'Node Type': 'Index Scan', 'Relation Name': 'recipes_recipe',
+                 'Plans': [{'Node Type': 'Seq Scan',
+                            'Relation Name': 'users_user'}]},
+            ],
+        }}])
+        self.assertEqual(
+            sorted(postgres_seq_scans(plan)), ['recipes_tag', 'users_user']
+        )
+
+
+class ExplainQueriesTests(TestCase):
+
+    def explain(self, *args):
+        out = StringIO()
+        call_command('explain_queries', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_every_query(self):
+        output = self.explain()
+        for name in Command().get_queries():
+            self.assertIn(f'{name}: ', output)
+
+    def test_strict(self):
+        self.explain('--strict')
+        scan = {'text_search': Recipe.objects.filter(
+            text__contains='суп'
+        ).order_by()}
+        table = Recipe._meta.db_table
+        with mock.patch.object(Command, 'get_queries', return_value=scan):
+            self.assertIn(
+                f'text_search: последовательное сканирование {table}',
+                self.explain()
+            )
+            self.explain('--strict', '--ignore', table)
+            with self.assertRaises(CommandError):
+                self.explain('--strict')
@@ -0,0 +1,85 @@
+from django.test import override_settings
+
+from recipes.models import FeedEntry
+from users.models import Follow
+from .base import ApiTestCase
+
+
+class FeedTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reader = self.users[2]
+        self.client = self.client_for(self.reader)
+
+    def feed_ids(self):
+        return list(FeedEntry.objects.filter(
+            user=self.reader
+        ).values_list('recipe_id', flat=True))
+
+    def test_fan_out_on_create(self):
+        Follow.objects.create(user=self.reader, author=self.users[0])
+        first = self.create_recipe(self.users[0])['id']
+        self.create_recipe(self.users[1])
+        second = self.create_recipe(self.users[0])['id']
+        self.assertEqual(self.feed_ids(), [second, first])
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [second, first]
+        )
+
+    @override_settings(FEED_BACKFILL_SIZE=2)
+    def test_backfill_on_subscribe(self):
+        recipe_ids = [self.create_recipe(self.users[0])['id']
+                      for _ in range(3)]
+        self.create_recipe(self.users[1])
+        response = self.client.post(
+            f'/api/users/{self.users[0].id}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.feed_ids(), recipe_ids[:0:-1])
+
+    def test_backfill_on_batch_subscribe(self):
+        first = self.create_recipe(self.users[0])['id']
+        second = self.create_recipe(self.users[1])['id']
+        response = self.client.post(
+            '/api/users/batch/subscribe/',
+            {'ids': [self.users[0].id, self.users[1].id]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.feed_ids(), [second, first])
+        self.client.post(
+            '/api/users/batch/subscribe/',
+            {'ids': [self.users[0].id]},
+            format='json'
+        )
+        self.assertEqual(self.feed_ids(), [second, first])
+
+    def test_prune_on_unsubscribe(self):
+        first = self.create_recipe(self.users[0])['id']
+        second = self.create_recipe(self.users[1])['id']
+        self.client.post(
+            '/api/users/batch/subscribe/',
+            {'ids': [self.users[0].id, self.users[1].id]},
+            format='json'
+        )
+        response = self.client.delete(
+            f'/api/users/{self.users[0].id}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.feed_ids(), [second])
+        self.create_recipe(self.users[0])
+        self.assertEqual(self.feed_ids(), [second])
+        self.client.post(f'/api/users/{self.users[0].id}/subscribe/')
+        self.client.delete(
+            '/api/users/batch/subscribe/',
+            {'ids': [self.users[0].id, self.users[1].id]},
+            format='json'
+        )
+        self.assertEqual(self.feed_ids(), [])
+        self.assertFalse(
+            FeedEntry.objects.filter(recipe=first).exists()
+        )
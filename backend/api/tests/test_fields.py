@@ -0,0 +1,62 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .base import ApiTestCase
+
+
+class SparseFieldsetTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.users[0]
+        self.client = self.client_for(self.users[1])
+        self.recipe = self.create_recipe(
+            self.author, ingredients=self.ingredients[:2]
+        )
+
+    def test_full_representation_by_default(self):
+        recipe = self.client.get('/api/recipes/').json()['results'][0]
+        self.assertIn('text', recipe)
+        self.assertIsInstance(recipe['author'], dict)
+        self.assertEqual(len(recipe['ingredients']), 2)
+
+    def test_fields_skip_unused_columns_and_relations(self):
+        with CaptureQueriesContext(connection) as queries:
+            recipe = self.client.get(
+                '/api/recipes/?fields=id,name,author,tags,is_favorited'
+            ).json()['results'][0]
+        self.assertEqual(
+            set(recipe), {'id', 'name', 'author', 'tags', 'is_favorited'}
+        )
+        self.assertEqual(recipe['author'], self.author.id)
+        self.assertEqual(recipe['tags'], [tag.id for tag in self.tags])
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('ingredient', sql)
+        self.assertNotIn('"text"', sql)
+
+    def test_expand(self):
+        recipe = self.client.get(
+            '/api/recipes/?fields=id,author&expand=author'
+        ).json()['results'][0]
+        self.assertEqual(recipe['author']['username'], self.author.username)
+        self.assertIs(recipe['author']['is_subscribed'], False)
+
+    def test_detail_and_users(self):
+        recipe = self.client.get(
+            f'/api/recipes/{self.recipe["id"]}/?fields=ingredients'
+        ).json()
+        self.assertEqual(list(recipe), ['ingredients'])
+        self.assertEqual(len(recipe['ingredients']), 2)
+        self.assertEqual(
+            self.client.get(
+                f'/api/users/{self.author.id}/?fields=id,username'
+            ).json(),
+            {'id': self.author.id, 'username': self.author.username}
+        )
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(
+            self.client.get(
+                '/api/users/subscriptions/?fields=id,recipes_count'
+            ).json()['results'],
+            [{'id': self.author.id, 'recipes_count': 1}]
+        )
@@ -0,0 +1,51 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import Recipe
+from .base import ApiTestCase
+
+
+class TagFilterTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.users[0])
+        self.create_recipe(self.users[0], tags=self.tags[:1], name='a')
+        self.both = self.create_recipe(
+            self.users[0], tags=self.tags[:2], name='ab'
+        )['id']
+        self.create_recipe(self.users[0], tags=self.tags[2:], name='c')
+
+    def names(self, query):
+        return sorted(
+            recipe['name'] for recipe in
+            self.client.get(f'/api/recipes/{query}').json()['results']
+        )
+
+    def test_filter_by_tags(self):
+        self.assertEqual(self.names('?tags=tag0'), ['a', 'ab'])
+        self.assertEqual(self.names('?tags=tag0&tags=tag2'), ['a', 'ab', 'c'])
+        self.assertEqual(
+            self.names('?tags=tag0&tags=tag1&tags_match=all'), ['ab']
+        )
+        self.assertEqual(self.names('?tags=unknown'), [])
+
+    def test_masks_follow_tag_changes(self):
+        self.client.patch(
+            f'/api/recipes/{self.both}/', {'tags': [self.tags[2].id]},
+            format='json'
+        )
+        self.assertEqual(self.names('?tags=tag2'), ['ab', 'c'])
+        self.tags[2].recipes.remove(self.both)
+        self.assertEqual(self.names('?tags=tag2'), ['c'])
+        self.tags[0].recipes.add(self.both)
+        self.assertEqual(self.names('?tags=tag0'), ['a', 'ab'])
+        self.tags[0].recipes.clear()
+        self.assertEqual(self.names('?tags=tag0'), [])
+
+    def test_rebuild_tags_masks(self):
+        Recipe.objects.update(tags_mask=0)
+        self.assertEqual(self.names('?tags=tag0'), [])
+        call_command('rebuild_tags_masks', stdout=StringIO())
+        self.assertEqual(self.names('?tags=tag0'), ['a', 'ab'])
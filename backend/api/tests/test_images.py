@@ -0,0 +1,61 @@
+import base64
+import os
+from io import BytesIO
+from unittest import mock
+
+from django.test import override_settings
+from PIL import Image
+
+from recipes.models import Recipe
+from .base import IMAGE, ApiTestCase
+
+
+class RecipeImageTests(ApiTestCase):
+
+    def post_image(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client_for(self.users[0]).post('/api/recipes/', {
+                'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5,
+                'image': image, 'tags': [self.tags[0].id],
+                'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+            }, format='json')
+
+    def test_image_is_processed(self):
+        response = self.post_image(IMAGE)
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        self.assertTrue(recipe.image.name.startswith('recipes/images/'))
+        self.assertTrue(recipe.image_thumbnails)
+
+    def test_invalid_payload_is_rejected_before_save(self):
+        not_image = base64.b64encode(b'not an image').decode()
+        for image in ('data:image/png;base64,%%%',
+                      f'data:image/png;base64,{not_image}'):
+            with self.subTest(image=image):
+                response = self.post_image(image)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('image', response.json())
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(IMAGE_HEADER_SIZE=1000)
+    def test_only_header_is_decoded_in_request(self):
+        file = BytesIO()
+        Image.frombytes('RGB', (100, 100), os.urandom(30000)).save(
+            file, 'PNG'
+        )
+        content = base64.b64encode(file.getvalue()).decode()
+        broken = f'{content[:-4000]}{"!" * 4000}'
+        with mock.patch('api.images.base64.b64decode',
+                        wraps=base64.b64decode) as b64decode, \
+                self.assertLogs('api.images', 'ERROR'):
+            response = self.post_image(f'data:image/png;base64,{broken}')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(b64decode.call_args_list[0].args[0]), 1000)
+        self.assertFalse(Recipe.objects.get().image)
+
+    def test_processing_error_is_logged(self):
+        with mock.patch('api.images.process_recipe_image',
+                        side_effect=OSError), \
+                self.assertLogs('api.images', 'ERROR'):
+            response = self.post_image(IMAGE)
+        self.assertEqual(response.status_code, 201, response.content)
@@ -0,0 +1,169 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+
+from recipes.management.commands.load_ingredients import read_json
+from recipes.models import Ingredient, IngredientInRecipe, ShoppingCartTotal
+from .base import ApiTestCase, ApiTestMixin
+
+ROWS = [
+    ('Соль', 'г'),
+    ('  Морская   соль ', 'г'),
+    ('соль', 'г'),
+    ('Соль', 'г'),
+    ('Соль', 'щепотка'),
+    ('', 'г'),
+    ('Х' * 201, 'г'),
+]
+NAMES = {('Соль', 'г'), ('Морская соль', 'г'), ('соль', 'г'),
+         ('Соль', 'щепотка')}
+
+
+class LoadIngredientsTests(ApiTestCase):
+
+    def write(self, name, content):
+        path = f'{self.temp_dir}/{name}'
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def load(self, path, **options):
+        stdout = StringIO()
+        call_command('load_ingredients', path, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def loaded(self):
+        return set(Ingredient.objects.exclude(
+            name__startswith='Ингредиент'
+        ).values_list('name', 'measurement_unit'))
+
+    def files(self):
+        items = [{'name': name, 'measurement_unit': unit}
+                 for name, unit in ROWS]
+        return {
+            'csv': ''.join(f'"{name}",{unit}\n' for name, unit in ROWS)
+            + 'только название\n',
+            'json': json.dumps(items, ensure_ascii=False),
+            'jsonl': '\n'.join(
+                json.dumps(item, ensure_ascii=False) for item in items
+            ) + '\n\n',
+        }
+
+    def test_formats(self):
+        for file_format, content in self.files().items():
+            with self.subTest(file_format=file_format):
+                Ingredient.objects.exclude(
+                    name__startswith='Ингредиент'
+                ).delete()
+                output = self.load(self.write(
+                    f'ingredients.{file_format}', content
+                ))
+                self.assertIn('добавлено 4', output)
+                self.assertEqual(self.loaded(), NAMES)
+
+    def test_rerun_adds_nothing(self):
+        for file_format, content in self.files().items():
+            with self.subTest(file_format=file_format):
+                path = self.write(f'ingredients.{file_format}', content)
+                self.load(path)
+                ids = set(Ingredient.objects.values_list('id', flat=True))
+                output = self.load(path, batch_size=2)
+                self.assertIn('добавлено 0', output)
+                self.assertEqual(
+                    set(Ingredient.objects.values_list('id', flat=True)),
+                    ids
+                )
+        self.assertEqual(self.loaded(), NAMES)
+
+    def test_format_option(self):
+        path = self.write('ingredients.txt', self.files()['jsonl'])
+        self.load(path, format='jsonl')
+        self.assertEqual(self.loaded(), NAMES)
+
+    def test_json_items_across_chunks(self):
+        items = [{'name': f'Ингредиент {i}', 'measurement_unit': 'г'}
+                 for i in range(50)]
+        self.assertEqual(
+            list(read_json(StringIO(json.dumps(items)), chunk_size=7)),
+            [(item['name'], 'г') for item in items]
+        )
+
+
+@override_settings(IMAGE_PROCESSING_WORKERS=0)
+class DedupeIngredientsTests(ApiTestMixin, TransactionTestCase):
+    """Дубликаты создаются в базе без ограничения unique_ingredient.
+
+    SQLite пересоздает таблицу по Meta модели, поэтому на время удаления
+    ограничения оно убирается и из Meta.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.create_fixtures()
+        constraints = Ingredient._meta.constraints
+        constraint, = [
+            constraint for constraint in constraints
+            if constraint.name == 'unique_ingredient'
+        ]
+        with mock.patch.object(Ingredient._meta, 'constraints', [
+            other for other in constraints if other is not constraint
+        ]), connection.schema_editor() as editor:
+            editor.remove_constraint(Ingredient, constraint)
+        self.addCleanup(self.restore_constraint, constraint)
+
+    def restore_constraint(self, constraint):
+        Ingredient.objects.all().delete()
+        with connection.schema_editor() as editor:
+            editor.add_constraint(Ingredient, constraint)
+
+    def test_merge_duplicates(self):
+        target = self.ingredients[0]
+        duplicate = Ingredient.objects.create(
+            name=target.name, measurement_unit=target.measurement_unit
+        )
+        first = self.create_recipe(
+            self.users[0],
+            ingredients=[target, duplicate, self.ingredients[1]],
+            amounts=[2, 3, 4]
+        )['id']
+        second = self.create_recipe(
+            self.users[0], ingredients=[duplicate], amounts=[5]
+        )['id']
+        self.client_for(self.users[1]).post(
+            f'/api/recipes/{second}/shopping_cart/'
+        )
+        kept = {
+            row.recipe_id: row.id for row in IngredientInRecipe.objects.filter(
+                ingredient__in=[target, duplicate]
+            ).order_by('-ingredient_id')
+        }
+        stdout = StringIO()
+        call_command('dedupe_ingredients', stdout=stdout)
+        self.assertIn('Удалено дубликатов ингредиентов: 1', stdout.getvalue())
+        self.assertFalse(Ingredient.objects.filter(pk=duplicate.pk).exists())
+        self.assertEqual(
+            set(IngredientInRecipe.objects.values_list(
+                'id', 'recipe_id', 'ingredient_id', 'amount'
+            )),
+            {
+                (kept[first], first, target.id, 5),
+                (IngredientInRecipe.objects.get(
+                    recipe=first, ingredient=self.ingredients[1]
+                ).id, first, self.ingredients[1].id, 4),
+                (kept[second], second, target.id, 5),
+            }
+        )
+        self.assertEqual(
+            list(ShoppingCartTotal.objects.values_list(
+                'user', 'ingredient', 'total'
+            )),
+            [(self.users[1].id, target.id, 5)]
+        )
+        stdout = StringIO()
+        call_command('dedupe_ingredients', stdout=stdout)
+        self.assertIn('Удалено дубликатов ингредиентов: 0', stdout.getvalue())
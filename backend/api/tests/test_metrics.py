@@ -0,0 +1,24 @@
+from .base import ApiTestCase
+
+
+class MetricsTests(ApiTestCase):
+
+    def test_metrics(self):
+        client = self.client_for(self.users[0])
+        recipe = self.create_recipe(self.users[0])
+        client.get('/api/tags/')
+        client.get('/api/tags/')
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(f'/api/recipes/{recipe["id"]}/shopping_cart/')
+        response = client.get('/api/recipes/download_shopping_cart/')
+        b''.join(response.streaming_content)
+        text = self.client_for().get('/metrics').content.decode()
+        self.assertIn('view="api:tag-list"', text)
+        self.assertIn('foodgram_request_db_queries', text)
+        self.assertIn(
+            'foodgram_cache_requests_total{cache="responses",result="hit"}',
+            text
+        )
+        self.assertIn(
+            'foodgram_shopping_list_items_count{format="txt"}', text
+        )
@@ -0,0 +1,65 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .base import ApiTestCase
+
+
+class RecipePaginationTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_ids = [
+            self.create_recipe(self.users[0], name=f'Рецепт {i}')['id']
+            for i in range(8)
+        ]
+        self.recipe_ids.reverse()
+        self.client = self.client_for()
+
+    def test_page_number_is_default(self):
+        response = self.client.get('/api/recipes/').json()
+        self.assertEqual(response['count'], 8)
+        self.assertIn('page=2', response['next'])
+        self.assertIsNone(response['previous'])
+        self.assertEqual(
+            [recipe['id'] for recipe in response['results']],
+            self.recipe_ids[:6]
+        )
+        response = self.client.get(response['next']).json()
+        self.assertEqual(
+            [recipe['id'] for recipe in response['results']],
+            self.recipe_ids[6:]
+        )
+
+    def test_cursor_follows_next(self):
+        url = '/api/recipes/?pagination=cursor&limit=3'
+        recipe_ids = []
+        pages = 0
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('count', data)
+            self.assertLessEqual(len(data['results']), 3)
+            recipe_ids.extend(recipe['id'] for recipe in data['results'])
+            url = data['next']
+            if url is not None:
+                self.assertIn('cursor=', url)
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(recipe_ids, self.recipe_ids)
+
+    def test_cursor_previous(self):
+        first = self.client.get('/api/recipes/?pagination=cursor').json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_cursor_without_count(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/recipes/?pagination=cursor')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'].upper() for query in context
+        ))
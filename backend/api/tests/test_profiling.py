@@ -0,0 +1,44 @@
+import json
+
+from django.test import override_settings
+
+from users.models import User
+from .base import ApiTestCase
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_PROFILING_SLOW_MS=0)
+class QueryProfilingTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.assertLogs('api.profiling', 'INFO'):
+            self.create_recipe(self.users[0])
+
+    def test_server_timing_and_log(self):
+        with self.assertLogs('api.profiling', 'INFO') as logs:
+            response = self.client_for(self.users[1]).get('/api/recipes/')
+        for metric in ('db;dur=', 'serialize;dur=', 'render;dur='):
+            self.assertIn(metric, response['Server-Timing'])
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertGreaterEqual(record['queries'], 1)
+        self.assertEqual(record['size'], len(response.content))
+
+    def test_slow_requests_for_staff_only(self):
+        url = '/api/profiling/slow-requests/'
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password'
+        )
+        with self.assertLogs('api.profiling', 'INFO'):
+            self.client_for(self.users[1]).get('/api/recipes/')
+            self.assertEqual(
+                self.client_for(self.users[1]).get(url).status_code, 403
+            )
+            slow = self.client_for(admin).get(url).json()
+        self.assertIn('/api/recipes/', [request['path'] for request in slow])
+
+
+class QueryProfilingDisabledTests(ApiTestCase):
+
+    def test_no_server_timing(self):
+        response = self.client_for(self.users[0]).get('/api/tags/')
+        self.assertNotIn('Server-Timing', response)
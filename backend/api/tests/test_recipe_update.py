@@ -0,0 +1,106 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import IngredientInRecipe, Recipe
+from recipes.signals import recipe_changed
+from .base import ApiTestCase
+
+
+class RecipeUpdateTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.users[0]
+        self.client = self.client_for(self.author)
+        self.recipe = self.create_recipe(
+            self.author, tags=self.tags[:2],
+            ingredients=self.ingredients[:3], amounts=[1, 2, 3]
+        )['id']
+        self.changes = []
+        recipe_changed.connect(self.record_changes)
+        self.addCleanup(recipe_changed.disconnect, self.record_changes)
+
+    def record_changes(self, sender, instance, **kwargs):
+        self.changes.append(kwargs)
+
+    def rows(self):
+        return {
+            ingredient_id: (row_id, amount)
+            for row_id, ingredient_id, amount in
+            IngredientInRecipe.objects.filter(recipe=self.recipe).values_list(
+                'id', 'ingredient_id', 'amount'
+            )
+        }
+
+    def patch(self, data):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe}/', data, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        table = IngredientInRecipe._meta.db_table
+        return [
+            query['sql'].split()[0] for query in context
+            if table in query['sql']
+            and query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+
+    def amounts(self, *amounts):
+        return [
+            {'id': self.ingredients[index].id, 'amount': amount}
+            for index, amount in amounts
+        ]
+
+    def test_only_changed_rows_are_written(self):
+        before = self.rows()
+        writes = self.patch({
+            'name': 'Новое название', 'cooking_time': 5,
+            'tags': [self.tags[1].id, self.tags[2].id],
+            'ingredients': self.amounts((0, 1), (1, 5), (3, 4)),
+        })
+        self.assertEqual(sorted(writes), ['DELETE', 'INSERT', 'UPDATE'])
+        after = self.rows()
+        first, second, removed, added = (
+            ingredient.id for ingredient in self.ingredients[:4]
+        )
+        self.assertEqual(after[first], before[first])
+        self.assertEqual(after[second], (before[second][0], 5))
+        self.assertNotIn(removed, after)
+        self.assertEqual(after[added][1], 4)
+        self.assertEqual(self.changes, [{
+            'signal': recipe_changed,
+            'fields': {'name'},
+            'tags_added': {self.tags[2].id},
+            'tags_removed': {self.tags[0].id},
+            'ingredients_added': {added},
+            'ingredients_removed': {removed},
+            'ingredients_changed': {second},
+        }])
+
+    def test_unchanged_recipe_is_not_written(self):
+        before = self.rows()
+        version = Recipe.objects.get(pk=self.recipe).version
+        writes = self.patch({
+            'name': 'Рецепт', 'cooking_time': 5,
+            'tags': [self.tags[0].id, self.tags[1].id],
+            'ingredients': self.amounts((2, 3), (0, 1), (1, 2)),
+        })
+        self.assertEqual(writes, [])
+        self.assertEqual(self.rows(), before)
+        self.assertEqual(self.changes, [])
+        self.assertEqual(Recipe.objects.get(pk=self.recipe).version, version)
+
+    def test_amount_change_only(self):
+        before = self.rows()
+        writes = self.patch({'ingredients': self.amounts(
+            (0, 1), (1, 2), (2, 7)
+        )})
+        self.assertEqual(writes, ['UPDATE'])
+        third = self.ingredients[2].id
+        self.assertEqual(self.rows()[third], (before[third][0], 7))
+        change, = self.changes
+        self.assertEqual(change['fields'], set())
+        self.assertEqual(change['ingredients_changed'], {third})
+        self.assertEqual(
+            change['ingredients_added'] | change['ingredients_removed'], set()
+        )
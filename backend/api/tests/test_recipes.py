@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from users.models import Follow
+from .base import ApiTestCase
+
+
+class RecipeListTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            self.create_recipe(self.users[0], name=f'Первый {i}')
+            self.create_recipe(self.users[1], tags=self.tags[:1],
+                               ingredients=self.ingredients[:2],
+                               name=f'Второй {i}')
+        Follow.objects.create(user=self.users[2], author=self.users[0])
+        self.client = self.client_for(self.users[2])
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.assertEqual(
+            self.count_queries('/api/recipes/?limit=2'),
+            self.count_queries('/api/recipes/?limit=6')
+        )
+
+    def test_cached_list_queries(self):
+        self.client.get('/api/recipes/')
+        with self.assertNumQueries(2):
+            self.client.get('/api/recipes/?limit=6')
+
+    def test_viewer_flags(self):
+        recipe = self.client.get('/api/recipes/').json()['results'][0]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/recipes/{recipe["id"]}/favorite/')
+        data = self.client.get('/api/recipes/').json()['results']
+        subscribed = {
+            item['author']['id']: item['author']['is_subscribed']
+            for item in data
+        }
+        self.assertEqual(
+            subscribed, {self.users[0].id: True, self.users[1].id: False}
+        )
+        self.assertEqual(sum(item['is_favorited'] for item in data), 1)
+        self.assertEqual(
+            set(data[-1]['ingredients'][0]),
+            {'id', 'name', 'measurement_unit', 'amount'}
+        )
+
+    def test_anonymous(self):
+        response = self.client_for().get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['results'][0]['is_favorited'])
@@ -0,0 +1,63 @@
+import os
+
+from django.conf import settings
+from django.test import override_settings
+
+from .base import ApiTestCase
+
+
+class RelationSetTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.users[0]
+        self.client = self.client_for(self.users[1])
+        self.recipe = self.create_recipe(
+            self.author, ingredients=self.ingredients[:2]
+        )['id']
+        self.url = f'/api/recipes/{self.recipe}/'
+
+    def flags(self):
+        recipe = self.client.get(self.url).json()
+        return (recipe['is_favorited'], recipe['is_in_shopping_cart'],
+                recipe['author']['is_subscribed'])
+
+    def test_cached_sets_skip_relation_queries(self):
+        self.assertEqual(self.flags(), (False, False, False))
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_sets_follow_changes(self):
+        self.flags()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{self.url}favorite/')
+            self.client.post(f'{self.url}shopping_cart/')
+            self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.flags(), (True, True, True))
+        self.assertIs(self.client.get(
+            f'/api/users/{self.author.id}/'
+        ).json()['is_subscribed'], True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'{self.url}favorite/')
+            self.client.delete(
+                '/api/users/batch/subscribe/', {'ids': [self.author.id]},
+                format='json'
+            )
+        self.assertEqual(self.flags(), (False, True, False))
+        self.assertIs(
+            self.client_for().get(self.url).json()['is_favorited'], False
+        )
+
+    @override_settings(RELATIONS_VERSION_BUCKETS=2)
+    def test_version_files_are_bounded(self):
+        before = set(os.listdir(settings.DATA_VERSIONS_DIR))
+        for user in self.users:
+            self.client = self.client_for(user)
+            self.assertEqual(self.flags(), (False, False, False))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'{self.url}favorite/')
+            self.assertEqual(self.flags(), (True, False, False))
+        self.assertLessEqual(
+            set(os.listdir(settings.DATA_VERSIONS_DIR)) - before,
+            {'relations-0', 'relations-1'}
+        )
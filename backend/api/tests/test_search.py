@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+
+from recipes.models import Recipe, RecipeSearch
+from recipes.search import remove_recipes
+from .base import ApiTestCase
+
+
+class RecipeSearchTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.users[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soup, self.pie, self.salad = (
+                self.create_recipe(
+                    self.users[0], ingredients=[ingredient], name=name
+                )['id']
+                for name, ingredient in zip(
+                    ('Картофельный суп', 'Пирог с картошкой', 'Салат'),
+                    self.ingredients
+                )
+            )
+
+    def search(self, query):
+        return [
+            recipe['id'] for recipe in self.client.get(
+                '/api/recipes/', {'search': query}
+            ).json()['results']
+        ]
+
+    def test_search_by_word_forms(self):
+        self.assertEqual(self.search('супы'), [self.soup])
+        self.assertEqual(self.search('картошка'), [self.pie])
+        self.assertEqual(self.search('zzz'), [])
+
+    def test_index_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredients[2].name = 'огурцы'
+            self.ingredients[2].save()
+        self.assertEqual(self.search('огурцов'), [self.salad])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f'/api/recipes/{self.salad}/', {'name': 'Суп холодный'},
+                format='json'
+            )
+        self.assertEqual(sorted(self.search('суп')), [self.soup, self.salad])
+        self.client.delete(f'/api/recipes/{self.soup}/')
+        self.assertEqual(self.search('суп'), [self.salad])
+
+    def test_results_are_capped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f'/api/recipes/{self.salad}/', {'name': 'Суп холодный'},
+                format='json'
+            )
+        self.assertEqual(len(self.search('суп')), 2)
+        with override_settings(RECIPE_SEARCH_LIMIT=1):
+            response = self.client.get('/api/recipes/', {'search': 'суп'})
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_rebuild_search_index(self):
+        remove_recipes(Recipe.objects.values_list('id', flat=True))
+        self.assertEqual(self.search('салат'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('салат'), [self.salad])
+
+    def test_postgres_documents(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Документы RecipeSearch пишутся только в Postgres')
+        self.assertEqual(
+            set(RecipeSearch.objects.values_list('recipe', flat=True)),
+            {self.soup, self.pie, self.salad}
+        )
+        self.assertEqual(
+            RecipeSearch.objects.values_list(
+                'document', flat=True
+            ).get(recipe=self.soup),
+            "'0':4B 'ингредиент':3B 'картофельн':1A 'описан':5C 'суп':2A"
+        )
+        Recipe.objects.filter(pk=self.soup).delete()
+        self.assertFalse(
+            RecipeSearch.objects.filter(recipe=self.soup).exists()
+        )
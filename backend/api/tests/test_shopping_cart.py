@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import ShoppingCartTotal, ShoppingList
+from .base import ApiTestCase
+
+
+class ShoppingCartTotalTests(ApiTestCase):
+
+    def totals(self, user):
+        return dict(ShoppingCartTotal.objects.filter(user=user).values_list(
+            'ingredient__name', 'total'
+        ))
+
+    def test_totals_follow_cart_and_recipe_changes(self):
+        author, buyer = self.client_for(self.users[0]), self.client_for(
+            self.users[1]
+        )
+        first = self.create_recipe(
+            self.users[0], ingredients=self.ingredients[:3], amounts=[1, 2, 3]
+        )
+        second = self.create_recipe(
+            self.users[0], ingredients=self.ingredients[1:4],
+            amounts=[10, 20, 30]
+        )
+        for recipe in (first, second):
+            response = buyer.post(
+                f'/api/recipes/{recipe["id"]}/shopping_cart/'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.totals(self.users[1]), {
+            'Ингредиент 0': 1, 'Ингредиент 1': 12, 'Ингредиент 2': 23,
+            'Ингредиент 3': 30,
+        })
+        response = author.patch(f'/api/recipes/{second["id"]}/', {
+            'ingredients': [
+                {'id': self.ingredients[1].id, 'amount': 5},
+                {'id': self.ingredients[4].id, 'amount': 7},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.totals(self.users[1]), {
+            'Ингредиент 0': 1, 'Ингредиент 1': 7, 'Ингредиент 2': 3,
+            'Ингредиент 4': 7,
+        })
+        response = buyer.delete(f'/api/recipes/{first["id"]}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.totals(self.users[1]), {
+            'Ингредиент 1': 5, 'Ингредиент 4': 7,
+        })
+        response = buyer.get('/api/recipes/download_shopping_cart/')
+        self.assertIn(
+            'Ингредиент 1 (г), 5',
+            b''.join(response.streaming_content).decode()
+        )
+        author.delete(f'/api/recipes/{second["id"]}/')
+        self.assertEqual(self.totals(self.users[1]), {})
+
+    def test_rebuild_command_fills_existing_carts(self):
+        recipe = self.create_recipe(
+            self.users[0], ingredients=self.ingredients[:2], amounts=[2, 3]
+        )
+        ShoppingList.objects.create(user=self.users[1], recipe_id=recipe['id'])
+        self.assertEqual(self.totals(self.users[1]), {})
+        call_command('rebuild_shopping_totals', stdout=StringIO())
+        self.assertEqual(self.totals(self.users[1]), {
+            'Ингредиент 0': 2, 'Ингредиент 1': 3,
+        })
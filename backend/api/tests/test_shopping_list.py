@@ -0,0 +1,65 @@
+import csv
+from io import StringIO
+
+from .base import ApiTestCase
+
+
+class ShoppingListExportTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.users[1])
+        for amounts in ([1, 2], [10, 20]):
+            recipe = self.create_recipe(
+                self.users[0], ingredients=self.ingredients[:2],
+                amounts=amounts
+            )
+            self.client.post(f'/api/recipes/{recipe["id"]}/shopping_cart/')
+
+    def download(self, **params):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', params
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_txt_by_default(self):
+        response, content = self.download()
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename=shopping-list.txt'
+        )
+        self.assertEqual(content.decode().splitlines(), [
+            'Список покупок ',
+            'Ингредиент 0 (г), 11',
+            'Ингредиент 1 (г), 22',
+        ])
+
+    def test_csv(self):
+        response, content = self.download(format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(list(csv.reader(StringIO(content.decode()))), [
+            ['Ингредиент', 'Единица измерения', 'Количество'],
+            ['Ингредиент 0', 'г', '11'],
+            ['Ингредиент 1', 'г', '22'],
+        ])
+
+    def test_pdf(self):
+        response, content = self.download(format='pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename=shopping-list.pdf'
+        )
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_accept_header_and_anonymous(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', HTTP_ACCEPT='text/csv'
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(self.client_for().get(
+            '/api/recipes/download_shopping_cart/'
+        ).status_code, 401)
@@ -0,0 +1,47 @@
+import base64
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from api.models import Upload
+from .base import IMAGE, ApiTestCase
+
+GIF = base64.b64decode(IMAGE.split(',', 1)[1])
+
+
+class UploadTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.users[0])
+
+    def post_multipart(self):
+        return self.client.post('/api/uploads/', {
+            'file': SimpleUploadedFile('image.gif', GIF, 'image/gif')
+        }, format='multipart')
+
+    def post_raw(self):
+        return self.client.post(
+            '/api/uploads/', GIF, content_type='image/gif',
+            HTTP_CONTENT_DISPOSITION='attachment; filename=image.gif'
+        )
+
+    def test_upload(self):
+        for post in (self.post_multipart, self.post_raw):
+            with self.subTest(post=post.__name__):
+                response = post()
+                self.assertEqual(response.status_code, 201, response.content)
+                self.assertTrue(Upload.objects.filter(
+                    token=response.json()['token']
+                ).exists())
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=len(GIF) - 1)
+    def test_upload_over_limit_is_aborted(self):
+        for post in (self.post_multipart, self.post_raw):
+            with self.subTest(post=post.__name__):
+                response = post()
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.json(), {'file': 'Изображение слишком большое.'}
+                )
+        self.assertFalse(Upload.objects.exists())
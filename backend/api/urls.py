@@ -1,7 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+from . import async_views
+from .views import (IngredientViewSet, RecipeViewSet, SlowRequestsView,
+                    TagViewSet, UploadView)
 
 app_name = 'api'
 
@@ -12,5 +14,13 @@ router.register('ingredients', IngredientViewSet)
 router.register('recipes', RecipeViewSet)
 
 urlpatterns = [
+    path('uploads/', UploadView.as_view(), name='uploads'),
+    path('profiling/slow-requests/', SlowRequestsView.as_view(),
+         name='slow-requests'),
+    path('async/recipes/', async_views.recipe_list),
+    path('async/recipes/<int:pk>/', async_views.recipe_detail),
+    path('async/ingredients/', async_views.ingredient_list),
+    path('async/tags/', async_views.tag_list),
+    path('async/users/subscriptions/', async_views.subscriptions),
     path('', include(router.urls))
 ]
@@ -1,44 +1,99 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from recipes.models import (Favourite, Ingredient, IngredientInRecipe, Recipe,
+from recipes.models import (Favourite, FeedEntry, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCartTotal,
                             ShoppingList, Tag)
+from users.models import User
+from .batch import add_relations, remove_relation, remove_relations
+from .cache import VersionedResponseCacheMixin
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPageNumberPagination
+from .images import validate_upload
+from .ingredient_search import ingredient_index
+from .metrics import track_shopping_list
+from .middleware import get_slow_requests
+from .models import Upload
+from .pagination import RecipeCursorPagination, RecipePagination
+from .parsers import LimitedUploadHandler, RawUploadParser
 from .permissions import IsAuthorAdminOrReadOnly
-from .serializers import (IngredientSerializer, RecipeCreateUpdateSerializer,
-                          RecipeReadSerializer, ShortRecipeSerializer,
-                          TagSerializer)
+from .recipe_coverage import coverage_index
+from .relations import relations_changed
+from .renderers import SHOPPING_LIST_RENDERERS
+from .serializers import (IdListSerializer, IngredientSerializer,
+                          RecipeCreateUpdateSerializer, RecipeReadSerializer,
+                          ShortRecipeSerializer, TagSerializer,
+                          UploadSerializer, load_recipe_cards)
+from .sparse import sparse_fieldset
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(VersionedResponseCacheMixin, ReadOnlyModelViewSet):
+    cache_version_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedResponseCacheMixin, ReadOnlyModelViewSet):
+    cache_version_name = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(name))
+
 
 class RecipeViewSet(ModelViewSet):
     queryset = Recipe.objects.all()
-    pagination_class = CustomPageNumberPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = [IsAuthorAdminOrReadOnly]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.get_serializer_class() is RecipeReadSerializer:
+            return RecipeReadSerializer.setup_eager_loading(
+                queryset, *sparse_fieldset(self.request)
+            )
+        return queryset
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        FeedEntry.objects.fan_out(recipe)
+        User.objects.filter(pk=self.request.user.pk).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+    def perform_destroy(self, instance):
+        users = list(instance.shopping_list.values_list('user', flat=True))
+        ingredients = list(
+            instance.ingredient_list.values_list('ingredient', flat=True)
+        )
+        with transaction.atomic():
+            instance.delete()
+            User.objects.filter(
+                pk=instance.author_id, recipes_count__gt=0
+            ).update(recipes_count=F('recipes_count') - 1)
+            if users:
+                ShoppingCartTotal.objects.refresh(users, ingredients)
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
@@ -52,48 +107,39 @@ class RecipeViewSet(ModelViewSet):
     )
     def favorite(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        user = request.user
-        if user.is_authenticated:
-            if not Favourite.objects.filter(
-                    user=user,
-                    recipe=recipe
-            ).exists():
-                Favourite.objects.create(
-                    user=user,
-                    recipe=recipe
-                )
-                serializer = ShortRecipeSerializer(
-                    recipe,
-                    context={'request': request}
+        try:
+            with transaction.atomic():
+                Favourite.objects.create(user=request.user, recipe=recipe)
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    favourites_count=F('favourites_count') + 1
                 )
-                return Response(serializer.data)
+                relations_changed(request.user.id)
+        except IntegrityError:
             return Response(
                 'Рецепт уже в избранном',
                 status=status.HTTP_400_BAD_REQUEST
             )
-        return Response(
-            'Требуется авторизация',
-            status=status.HTTP_401_UNAUTHORIZED
+        serializer = ShortRecipeSerializer(
+            recipe,
+            context={'request': request}
         )
+        return Response(serializer.data)
 
     @favorite.mapping.delete
     def remove_favorite(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        user = request.user
-        if user.is_authenticated:
-            favorite = Favourite.objects.filter(
-                user=user, recipe=recipe)
-            if favorite.exists():
-                favorite.delete()
-                return Response('Удален из избранного')
-            return Response(
-                'Рецепта нет в избранном',
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            if not remove_relation(Favourite, user=request.user,
+                                   recipe_id=pk):
+                get_object_or_404(Recipe, id=pk)
+                return Response(
+                    'Рецепта нет в избранном',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            Recipe.objects.filter(pk=pk, favourites_count__gt=0).update(
+                favourites_count=F('favourites_count') - 1
             )
-        return Response(
-            'Необходма авторизация',
-            status=status.HTTP_401_UNAUTHORIZED
-        )
+            relations_changed(request.user.id)
+        return Response('Удален из избранного')
 
     @action(
         detail=True,
@@ -102,45 +148,196 @@ class RecipeViewSet(ModelViewSet):
     )
     def shopping_cart(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        if ShoppingList.objects.filter(user=request.user,
-                                       recipe=recipe).exists():
+        try:
+            with transaction.atomic():
+                ShoppingList.objects.create(user=request.user, recipe=recipe)
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    in_carts_count=F('in_carts_count') + 1
+                )
+                relations_changed(request.user.id)
+                ShoppingCartTotal.objects.refresh(
+                    users=[request.user.id],
+                    ingredients=recipe.ingredient_list.values('ingredient')
+                )
+        except IntegrityError:
             return Response(
                 {'errors': 'УЖе находится в списке покупок'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ShoppingList.objects.create(user=request.user, recipe=recipe)
         serializer = ShortRecipeSerializer(recipe, many=False)
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
     def remove_from_shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        get_object_or_404(ShoppingList, user=request.user,
-                          recipe=recipe).delete()
+        with transaction.atomic():
+            if not remove_relation(ShoppingList, user=request.user,
+                                   recipe_id=pk):
+                get_object_or_404(Recipe, id=pk)
+                raise Http404
+            Recipe.objects.filter(pk=pk, in_carts_count__gt=0).update(
+                in_carts_count=F('in_carts_count') - 1
+            )
+            relations_changed(request.user.id)
+            ShoppingCartTotal.objects.refresh(
+                users=[request.user.id],
+                ingredients=IngredientInRecipe.objects.filter(
+                    recipe_id=pk
+                ).values('ingredient')
+            )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def change_relations(self, request, model, counter):
+        serializer = IdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            if request.method == 'POST':
+                results, changed = add_relations(
+                    model, request.user, 'recipe', ids, Recipe.objects.all()
+                )
+                counted = Recipe.objects.filter(id__in=changed)
+                delta = 1
+            else:
+                results, changed = remove_relations(
+                    model, request.user, 'recipe', ids
+                )
+                counted = Recipe.objects.filter(
+                    id__in=changed, **{f'{counter}__gt': 0}
+                )
+                delta = -1
+            counted.update(**{counter: F(counter) + delta})
+            if changed:
+                relations_changed(request.user.id)
+            if model is ShoppingList and changed:
+                ShoppingCartTotal.objects.refresh(
+                    users=[request.user.id],
+                    ingredients=IngredientInRecipe.objects.filter(
+                        recipe__in=changed
+                    ).values('ingredient')
+                )
+        return Response({'results': results})
+
     @action(
         detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='batch/favorite',
         permission_classes=[IsAuthenticated]
     )
-    def download_shopping_cart(self, request):
-        user = request.user
-        buy_list = IngredientInRecipe.objects.filter(
-            recipe__shopping_list__user=user).values(
-            'ingredient__name', 'ingredient__measurement_unit').annotate(
-            total_number=Sum('amount')
+    def favorite_batch(self, request):
+        return self.change_relations(request, Favourite, 'favourites_count')
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='batch/shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        return self.change_relations(request, ShoppingList, 'in_carts_count')
+
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        paginator = RecipeCursorPagination()
+        entries = paginator.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user), request, self
         )
-        text = 'Список покупок \n'
-        for item in buy_list:
-            amount = item['total_number']
-            name = item['ingredient__name']
-            measurement_unit = item['ingredient__measurement_unit']
-            text += (
-                f'{name} ({measurement_unit}), '
-                f'{amount}\n'
+        recipes = self.get_queryset().in_bulk(
+            [entry.recipe_id for entry in entries]
+        )
+        serializer = RecipeReadSerializer(
+            [recipes[entry.recipe_id] for entry in entries],
+            many=True,
+            context={'request': request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False)
+    def cook(self, request):
+        """Рецепты, которые лучше всего покрываются ингредиентами запроса"""
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            }
+            limit = int(request.query_params.get(
+                'limit', settings.RECIPE_COVERAGE_LIMIT
+            ))
+        except ValueError:
+            raise ValidationError(
+                {'errors': 'Ингредиенты и limit должны быть числами'}
             )
-        response = HttpResponse(text, content_type="text/plain")
+        if not ingredient_ids:
+            raise ValidationError({'errors': 'Укажите ингредиенты'})
+        limit = min(max(limit, 1), settings.RECIPE_COVERAGE_MAX_LIMIT)
+        ranked = coverage_index.top(ingredient_ids, limit)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in ranked]
+        )
+        load_recipe_cards(list(recipes.values()))
+        results = []
+        for recipe_id, coverage, matched in ranked:
+            if recipe_id not in recipes:
+                continue
+            data = RecipeReadSerializer(
+                recipes[recipe_id], context={'request': request}
+            ).data
+            data['coverage'] = round(coverage, 4)
+            data['matched_ingredients'] = matched
+            results.append(data)
+        return Response({'results': results})
+
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_LIST_RENDERERS
+    )
+    def download_shopping_cart(self, request):
+        renderer = request.accepted_renderer
+        buy_list = ShoppingCartTotal.objects.filter(
+            user=request.user
+        ).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'total'
+        ).iterator()
+        response = StreamingHttpResponse(
+            track_shopping_list(renderer, buy_list),
+            content_type=renderer.media_type
+        )
         response['Content-Disposition'] = (
-            'attachment; filename=shopping-list.txt'
+            f'attachment; filename=shopping-list.{renderer.format}'
         )
         return response
+
+
+class UploadView(APIView):
+    """Загрузка изображения файлом вместо base64 в теле рецепта.
+
+    Файл принимается как multipart или как тело запроса и пишется на диск
+    частями, токен загрузки передается в поле image_upload рецепта.
+    """
+
+    parser_classes = (MultiPartParser, RawUploadParser)
+    permission_classes = (IsAuthenticated,)
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [LimitedUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def post(self, request):
+        file = request.data.get('file')
+        if file is None:
+            raise ValidationError({'file': 'Нужно передать файл'})
+        validate_upload(file)
+        upload = Upload.objects.create(user=request.user, file=file)
+        return Response(UploadSerializer(upload).data,
+                        status=status.HTTP_201_CREATED)
+
+
+class SlowRequestsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_slow_requests())
@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,6 +76,22 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+# Версии данных для сброса кешей. Каталог должен быть общим для всех
+# процессов backend, включая команды manage.py.
+DATA_VERSIONS_DIR = os.getenv(
+    'DATA_VERSIONS_DIR', default=os.path.join(BASE_DIR, 'versions')
+)
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -109,6 +127,55 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+INGREDIENT_SEARCH_LIMIT = 50
+
+RECIPE_SEARCH_CONFIG = 'russian'
+# Сколько лучших совпадений поиска берется из индекса. Фильтры и
+# пагинация работают только с ними, поэтому count в ответе ?search= не
+# больше этого значения.
+RECIPE_SEARCH_LIMIT = 200
+
+RECIPE_COVERAGE_LIMIT = 10
+RECIPE_COVERAGE_MAX_LIMIT = 50
+RECIPE_COVERAGE_LOG_SIZE = 1024 * 1024
+
+FEED_BACKFILL_SIZE = 100
+
+BATCH_MAX_SIZE = 100
+
+RELATIONS_CACHE_TIMEOUT = 60 * 60
+RELATIONS_VERSION_BUCKETS = 1024
+
+RECIPE_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+ASYNC_DB_WORKERS = int(os.getenv('ASYNC_DB_WORKERS', default=10))
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='True').lower() == 'true'
+
+QUERY_PROFILING = os.getenv('QUERY_PROFILING', default='False').lower() == 'true'
+QUERY_PROFILING_SLOW_MS = int(os.getenv('QUERY_PROFILING_SLOW_MS', default=300))
+QUERY_PROFILING_SAMPLE_RATE = float(
+    os.getenv('QUERY_PROFILING_SAMPLE_RATE', default=1.0)
+)
+QUERY_PROFILING_BUFFER_SIZE = 100
+QUERY_PROFILING_DUPLICATE_THRESHOLD = 3
+
+IMAGE_PROCESSING_WORKERS = int(
+    os.getenv('IMAGE_PROCESSING_WORKERS', default=2)
+)
+IMAGE_MAX_PAYLOAD_SIZE = 20 * 1024 * 1024
+IMAGE_MAX_UPLOAD_SIZE = 15 * 1024 * 1024
+IMAGE_HEADER_SIZE = 96 * 1024
+IMAGE_MAX_SIZE = 1920
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 80
+RECIPE_THUMBNAIL_SIZES = (160, 480)
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
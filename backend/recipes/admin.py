@@ -1,7 +1,7 @@
 from django.contrib import admin
 
-from .models import (Favourite, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingList, Tag)
+from .models import (Favourite, FeedEntry, Ingredient, IngredientInRecipe,
+                     Recipe, ShoppingCartTotal, ShoppingList, Tag)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -66,9 +66,25 @@ class ShoppingListAdmin(admin.ModelAdmin):
     search_fields = ('user',)
 
 
+class ShoppingCartTotalAdmin(admin.ModelAdmin):
+    """Управление итогами списка покупок"""
+
+    list_display = ('user', 'ingredient', 'total')
+    list_filter = ('user',)
+
+
+class FeedEntryAdmin(admin.ModelAdmin):
+    """Управление лентой подписок"""
+
+    list_display = ('user', 'recipe', 'pub_date')
+    list_filter = ('user',)
+
+
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipesAdmin)
 admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
 admin.site.register(Favourite, FavouriteAdmin)
 admin.site.register(ShoppingList, ShoppingListAdmin)
+admin.site.register(ShoppingCartTotal, ShoppingCartTotalAdmin)
+admin.site.register(FeedEntry, FeedEntryAdmin)
@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Min
+
+from api.cache import bump_version
+from api.recipe_cards import recipe_cards_changed
+from api.recipe_coverage import recipe_ingredients_changed
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCartTotal, ShoppingList)
+
+
+class Command(BaseCommand):
+    help = ('Объединение ингредиентов с одинаковыми названием и единицей '
+            'измерения. Выполняется перед migrate, который добавляет '
+            'ограничение unique_ingredient.')
+
+    def handle(self, *args, **kwargs):
+        tables = connection.introspection.table_names()
+        if Ingredient._meta.db_table not in tables:
+            self.stdout.write('Таблицы ингредиентов еще нет')
+            return
+        with transaction.atomic():
+            targets = self.find_duplicates()
+            recipe_ids = self.merge_rows(targets)
+            if ShoppingCartTotal._meta.db_table in tables:
+                self.refresh_totals(targets, recipe_ids)
+            with connection.cursor() as cursor:
+                columns = {
+                    column.name
+                    for column in connection.introspection
+                    .get_table_description(cursor, Recipe._meta.db_table)
+                }
+                duplicates = list(targets)
+                for start in range(0, len(duplicates), 999):
+                    batch = duplicates[start:start + 999]
+                    cursor.execute(
+                        f'DELETE FROM {Ingredient._meta.db_table} '
+                        f'WHERE id IN ({", ".join(["%s"] * len(batch))})',
+                        batch
+                    )
+            if 'version' in columns:
+                recipe_cards_changed(Recipe.objects.filter(id__in=recipe_ids))
+            recipe_ingredients_changed(recipe_ids)
+        if targets:
+            bump_version('ingredients')
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено дубликатов ингредиентов: {len(targets)}, '
+            f'исправлено рецептов: {len(recipe_ids)}'
+        ))
+
+    def find_duplicates(self):
+        """Возвращает словарь id дубликата -> id остающегося ингредиента"""
+        groups = Ingredient.objects.order_by().values(
+            'name', 'measurement_unit'
+        ).annotate(
+            target=Min('id'), total=Count('id')
+        ).filter(total__gt=1)
+        targets = {}
+        for group in groups:
+            for ingredient_id in Ingredient.objects.filter(
+                name=group['name'],
+                measurement_unit=group['measurement_unit']
+            ).exclude(id=group['target']).values_list('id', flat=True):
+                targets[ingredient_id] = group['target']
+        return targets
+
+    def merge_rows(self, targets):
+        """Переводит строки рецептов на остающиеся ингредиенты.
+
+        Если в рецепте есть несколько строк одного ингредиента после
+        объединения, остается одна строка с суммой количеств.
+        """
+        rows = defaultdict(list)
+        for row in IngredientInRecipe.objects.filter(
+            ingredient__in=[*targets, *set(targets.values())]
+        ).order_by('id').only('id', 'recipe_id', 'ingredient_id', 'amount'):
+            target = targets.get(row.ingredient_id, row.ingredient_id)
+            rows[row.recipe_id, target].append(row)
+        changed = []
+        removed = []
+        for (recipe_id, target), group in rows.items():
+            if len(group) == 1 and group[0].ingredient_id == target:
+                continue
+            group.sort(key=lambda row: row.ingredient_id != target)
+            kept, *extra = group
+            kept.ingredient_id = target
+            kept.amount = sum(row.amount for row in group)
+            changed.append(kept)
+            removed.extend(row.id for row in extra)
+        IngredientInRecipe.objects.filter(id__in=removed).delete()
+        IngredientInRecipe.objects.bulk_update(
+            changed, ['ingredient', 'amount'], batch_size=999
+        )
+        return {row.recipe_id for row in changed}
+
+    def refresh_totals(self, targets, recipe_ids):
+        ShoppingCartTotal.objects.filter(ingredient__in=targets).delete()
+        users = set(ShoppingList.objects.filter(
+            recipe__in=recipe_ids
+        ).values_list('user', flat=True))
+        if users:
+            ShoppingCartTotal.objects.refresh(
+                users, set(targets.values())
+            )
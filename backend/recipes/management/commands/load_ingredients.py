@@ -1,27 +1,176 @@
 import csv
+import json
+import time
+from io import StringIO
+from itertools import islice
+from pathlib import Path
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.cache import bump_version
 from recipes.models import Ingredient
 
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            item = json.loads(line)
+            yield item['name'], item['measurement_unit']
+
+
+def read_json(file, chunk_size=64 * 1024):
+    """Потоково читает JSON массив объектов, не загружая файл целиком"""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON файл должен содержать массив')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError('Некорректный JSON файл')
+            buffer += chunk
+            continue
+        yield item['name'], item['measurement_unit']
+        buffer = buffer[end:]
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'jsonl': read_jsonl}
+
+
+def normalize(rows):
+    for name, measurement_unit in rows:
+        name = ' '.join(name.split())
+        measurement_unit = ' '.join(measurement_unit.split())
+        if (name and measurement_unit and len(name) <= NAME_LENGTH
+                and len(measurement_unit) <= UNIT_LENGTH):
+            yield name, measurement_unit
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = set(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
 
 class Command(BaseCommand):
-    help = 'Загрузка из csv файла'
-
-    def handle(self, *args, **kwargs):
-        data_path = settings.BASE_DIR
-        with open(
-            f'{data_path}/data/ingredients.csv',
-            'r',
-            encoding='utf-8'
-        ) as file:
-            data = csv.reader(file)
+    help = ('Загрузка ингредиентов из csv, json или jsonl файла. '
+            'Повторная загрузка не создает дубликатов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=f'{settings.BASE_DIR}/data/ingredients.csv',
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        start = time.perf_counter()
+        before = Ingredient.objects.count()
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            rows = normalize(READERS[file_format](file))
+            if connection.vendor == 'postgresql':
+                read = self.copy_rows(rows, options['batch_size'])
+            elif connection.vendor == 'sqlite':
+                read = self.execute_rows(rows, options['batch_size'])
+            else:
+                read = self.insert_rows(rows, options['batch_size'])
+        created = Ingredient.objects.count() - before
+        elapsed = time.perf_counter() - start
+        bump_version('ingredients')
+        self.stdout.write(self.style.SUCCESS(
+            f'Все ингридиенты загружены! Прочитано {read}, добавлено '
+            f'{created} за {elapsed:.2f} с ({read / elapsed:.0f} строк/с)'
+        ))
+
+    def progress(self, read):
+        self.stdout.write(f'Прочитано строк: {read}')
+
+    def insert_rows(self, rows, batch_size):
+        read = 0
+        for batch in batches(rows, batch_size):
             Ingredient.objects.bulk_create(
-                (Ingredient(
-                    name=row[0],
-                    measurement_unit=row[1])
-                    for row in data),
-                batch_size=999
+                (Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in batch),
+                batch_size=999,
+                ignore_conflicts=True
+            )
+            read += len(batch)
+            self.progress(read)
+        return read
+
+    def execute_rows(self, rows, batch_size):
+        """Загрузка через executemany без создания объектов моделей"""
+        table = Ingredient._meta.db_table
+        read = 0
+        with connection.cursor() as cursor:
+            for batch in batches(rows, batch_size):
+                cursor.executemany(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    'VALUES (%s, %s) '
+                    'ON CONFLICT (name, measurement_unit) DO NOTHING',
+                    list(batch)
+                )
+                read += len(batch)
+                self.progress(read)
+        return read
+
+    def copy_rows(self, rows, batch_size):
+        """Загрузка через COPY во временную таблицу и INSERT ON CONFLICT"""
+        table = Ingredient._meta.db_table
+        read = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import ('
+                f'name varchar({NAME_LENGTH}), '
+                f'measurement_unit varchar({UNIT_LENGTH}))'
+            )
+            for batch in batches(rows, batch_size):
+                buffer = StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    buffer
+                )
+                read += len(batch)
+                self.progress(read)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
             )
-        self.stdout.write(self.style.SUCCESS('Все ингридиенты загружены!'))
+            cursor.execute('DROP TABLE ingredient_import')
+        return read
@@ -0,0 +1,54 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favourite, Recipe, ShoppingList
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favourites_count', Favourite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingList, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def actual_count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчет денормализованных счетчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счетчики, не изменяя их',
+        )
+
+    def handle(self, *args, **options):
+        mismatched = 0
+        with transaction.atomic():
+            for model, counter, source, field in COUNTERS:
+                count = model.objects.alias(
+                    actual=actual_count(source, field)
+                ).exclude(**{counter: F('actual')}).count()
+                mismatched += count
+                self.stdout.write(
+                    f'{model.__name__}.{counter}: расхождений {count}'
+                )
+                if count and not options['check']:
+                    model.objects.update(
+                        **{counter: actual_count(source, field)}
+                    )
+        if options['check'] and mismatched:
+            raise CommandError(f'Неверных счетчиков: {mismatched}')
+        self.stdout.write(self.style.SUCCESS('Счетчики в порядке!'))
@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.search import create_search_index, index_recipes
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Перестроение полнотекстового индекса рецептов'
+
+    def handle(self, *args, **kwargs):
+        create_search_index()
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        with transaction.atomic():
+            for start in range(0, len(recipe_ids), BATCH_SIZE):
+                index_recipes(recipe_ids[start:start + BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {len(recipe_ids)}'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+
+from recipes.models import ShoppingCartTotal
+from users.models import User
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Пересчет итогов списков покупок всех пользователей'
+
+    def handle(self, *args, **kwargs):
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        for start in range(0, len(user_ids), BATCH_SIZE):
+            ShoppingCartTotal.objects.refresh(
+                user_ids[start:start + BATCH_SIZE]
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Итоги списков покупок пересчитаны: {len(user_ids)}'
+        ))
@@ -0,0 +1,27 @@
+from collections import defaultdict
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe, tags_mask
+
+
+class Command(BaseCommand):
+    help = 'Пересчет битовых масок тегов рецептов'
+
+    def handle(self, *args, **kwargs):
+        recipe_tags = defaultdict(list)
+        for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id'
+        ).iterator():
+            recipe_tags[recipe_id].append(tag_id)
+        recipes = list(Recipe.objects.only('id', 'tags_mask'))
+        for recipe in recipes:
+            recipe.tags_mask = tags_mask(recipe_tags[recipe.id])
+        with transaction.atomic():
+            Recipe.objects.bulk_update(
+                recipes, ['tags_mask'], batch_size=999
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Маски тегов пересчитаны: {len(recipes)}'
+        ))
@@ -1,10 +1,36 @@
+import time
+
 from colorfield.fields import ColorField
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models, transaction
+
+from users.models import DenormalizedCountersMixin, Follow
 
 User = get_user_model()
 
+TAGS_MASK_SIZE = 63
+
+
+def tags_mask(tag_ids):
+    """Битовая маска тегов: тегу с id N соответствует бит N - 1"""
+    mask = 0
+    for tag_id in tag_ids:
+        if 0 < tag_id <= TAGS_MASK_SIZE:
+            mask |= 1 << (tag_id - 1)
+    return mask
+
+
+def initial_version():
+    """Начальная версия рецепта - время создания в миллисекундах.
+
+    Так рецепт, получивший id удаленного, не совпадет с его версией.
+    """
+    return int(time.time() * 1000)
+
 
 class Tag(models.Model):
     """Модель тега"""
@@ -49,12 +75,23 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'),
+        ]
+        indexes = [
+            models.Index(
+                fields=('name',),
+                name='ingredient_name_prefix_idx',
+                opclasses=('varchar_pattern_ops',)),
+        ]
 
     def __str__(self):
         return f'{self.name} {self.measurement_unit}'
 
 
-class Recipe(models.Model):
+class Recipe(DenormalizedCountersMixin, models.Model):
     """Модель рецепта"""
     author = models.ForeignKey(
         User,
@@ -71,6 +108,12 @@ class Recipe(models.Model):
         blank=True,
         upload_to='recipes/images',
     )
+    image_thumbnails = models.JSONField(
+        'Миниатюры изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         'Описание рецепта',
     )
@@ -95,16 +138,86 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    favourites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Добавлений в список покупок',
+        default=0,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        'Битовая маска тегов',
+        default=0,
+        editable=False,
+    )
+    version = models.PositiveBigIntegerField(
+        'Версия карточки',
+        default=initial_version,
+        editable=False,
+    )
+
+    counter_fields = ('favourites_count', 'in_carts_count', 'version')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class SearchGinIndex(GinIndex):
+    """GIN-индекс в Postgres и обычный индекс в остальных базах"""
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().create_sql(model, schema_editor, using, **kwargs)
+        return models.Index.create_sql(
+            self, model, schema_editor, using, **kwargs
+        )
+
+
+class RecipeSearch(models.Model):
+    """Модель поискового документа рецепта для Postgres.
+
+    Документ собирается из названия, ингредиентов и описания рецепта с
+    весами A, B и C. В SQLite вместо него используется таблица FTS5.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='search',
+    )
+    document = SearchVectorField('Поисковый документ', null=True)
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+        indexes = [
+            SearchGinIndex(
+                fields=('document',),
+                name='recipe_search_document_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.recipe)
+
+
 class IngredientInRecipe(models.Model):
     """Модель количества ингредиентов в рецепте """
     recipe = models.ForeignKey(
@@ -132,6 +245,12 @@ class IngredientInRecipe(models.Model):
                 fields=('ingredient', 'recipe'),
                 name='unique_ingredient_in_recipe'),
         ]
+        indexes = [
+            models.Index(
+                fields=('recipe', 'ingredient'),
+                include=('amount',),
+                name='ingredient_in_recipe_cover_idx'),
+        ]
 
     def __str__(self):
         return f'{self.recipe} - {self.ingredient} - {self.amount}'
@@ -195,3 +314,139 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в список покупок'
+
+
+class ShoppingCartTotalManager(models.Manager):
+
+    def refresh(self, users, ingredients=None):
+        """Пересчитывает итоги списка покупок пользователей.
+
+        Затрагиваются только переданные ингредиенты, либо все, если
+        ингредиенты не указаны. Строки пользователей блокируются, чтобы
+        параллельные пересчеты не вставляли одни и те же итоги.
+        """
+        totals = self.filter(user__in=users)
+        amounts = IngredientInRecipe.objects.filter(
+            recipe__shopping_list__user__in=users
+        )
+        if ingredients is not None:
+            totals = totals.filter(ingredient__in=ingredients)
+            amounts = amounts.filter(ingredient__in=ingredients)
+        amounts = amounts.values(
+            'recipe__shopping_list__user', 'ingredient'
+        ).annotate(total=models.Sum('amount'))
+        with transaction.atomic(savepoint=False):
+            if connection.features.has_select_for_update:
+                list(User.objects.select_for_update().filter(
+                    pk__in=users
+                ).order_by('pk').values_list('pk', flat=True))
+            totals.delete()
+            self.bulk_create(
+                (self.model(
+                    user_id=item['recipe__shopping_list__user'],
+                    ingredient_id=item['ingredient'],
+                    total=item['total'])
+                    for item in amounts),
+                batch_size=999
+            )
+
+
+class ShoppingCartTotal(models.Model):
+    """Модель итогов списка покупок"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_cart_totals',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='shopping_cart_totals',
+    )
+    total = models.PositiveIntegerField('Общее количество')
+
+    objects = ShoppingCartTotalManager()
+
+    class Meta:
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='shopping_cart_total'),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.total}'
+
+
+class FeedEntryManager(models.Manager):
+
+    def fan_out(self, recipe):
+        """Добавляет новый рецепт в ленты подписчиков автора"""
+        followers = Follow.objects.filter(
+            author=recipe.author_id
+        ).values_list('user', flat=True).iterator()
+        self.bulk_create(
+            (self.model(user_id=user_id, recipe=recipe,
+                        pub_date=recipe.pub_date)
+             for user_id in followers),
+            batch_size=999,
+            ignore_conflicts=True
+        )
+
+    def backfill(self, user, author):
+        """Добавляет в ленту последние рецепты нового автора"""
+        recipes = Recipe.objects.filter(author=author).values_list(
+            'id', 'pub_date'
+        )[:settings.FEED_BACKFILL_SIZE]
+        self.bulk_create(
+            (self.model(user=user, recipe_id=recipe_id, pub_date=pub_date)
+             for recipe_id, pub_date in recipes),
+            ignore_conflicts=True
+        )
+
+    def prune(self, user, authors):
+        """Убирает из ленты рецепты авторов после отписки"""
+        self.filter(user=user, recipe__author__in=authors).delete()
+
+
+class FeedEntry(models.Model):
+    """Модель записи ленты подписок"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed_entries',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        ordering = ('-pub_date', '-id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-id'),
+                name='feed_entry_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
@@ -0,0 +1,200 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery
+
+from .models import IngredientInRecipe, Recipe, RecipeSearch
+
+try:
+    import snowballstemmer
+except ImportError:
+    snowballstemmer = None
+
+SEARCH_TABLE = 'recipes_search'
+WORD_RE = re.compile(r'\w+')
+
+
+class PostgresRecipeSearch:
+    """Поиск по документам RecipeSearch с GIN-индексом.
+
+    Документ строится SearchVector в базе: название, ингредиенты и
+    описание получают веса A, B и C, стемминг выполняет конфигурация
+    RECIPE_SEARCH_CONFIG. Результаты упорядочиваются SearchRank.
+    """
+
+    def create_index(self):
+        """Таблицу и индекс документов создает migrate"""
+
+    def document(self):
+        config = settings.RECIPE_SEARCH_CONFIG
+        return (
+            SearchVector('name', weight='A', config=config)
+            + SearchVector(
+                StringAgg('ingredients__name', ' '), weight='B', config=config
+            )
+            + SearchVector('text', weight='C', config=config)
+        )
+
+    def index(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        existing = Recipe.objects.filter(pk__in=recipe_ids).values_list(
+            'pk', flat=True
+        )
+        with transaction.atomic():
+            RecipeSearch.objects.bulk_create(
+                (RecipeSearch(recipe_id=pk) for pk in existing),
+                ignore_conflicts=True
+            )
+            RecipeSearch.objects.filter(recipe__in=recipe_ids).update(
+                document=Subquery(
+                    Recipe.objects.filter(pk=OuterRef('recipe')).annotate(
+                        document=self.document()
+                    ).order_by().values('document')
+                )
+            )
+
+    def remove(self, recipe_ids):
+        RecipeSearch.objects.filter(recipe__in=recipe_ids).delete()
+
+    def search(self, query, limit):
+        query = SearchQuery(
+            query, config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        return list(
+            RecipeSearch.objects.filter(document=query).annotate(
+                rank=SearchRank(F('document'), query)
+            ).order_by('-rank', '-recipe_id').values_list(
+                'recipe_id', flat=True
+            )[:limit]
+        )
+
+
+class SQLiteRecipeSearch:
+    """Замена полнотекстового поиска Postgres на FTS5 для SQLite.
+
+    FTS5 не умеет в русскую морфологию, поэтому слова приводятся к основе
+    стеммером Snowball до записи в индекс и в запросе. Без snowballstemmer
+    слова ищутся по префиксу.
+    """
+
+    def __init__(self):
+        self.stemmer = None
+        if snowballstemmer is not None:
+            self.stemmer = snowballstemmer.stemmer(
+                settings.RECIPE_SEARCH_CONFIG
+            )
+
+    def normalize(self, value):
+        words = WORD_RE.findall(value.lower())
+        if self.stemmer is None:
+            return words
+        return self.stemmer.stemWords(words)
+
+    def create_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+                f'USING fts5(name, ingredients, text)'
+            )
+
+    def index(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        ingredients = {}
+        for recipe_id, name in IngredientInRecipe.objects.filter(
+            recipe__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient__name'):
+            ingredients.setdefault(recipe_id, []).append(name)
+        rows = [
+            (
+                pk,
+                ' '.join(self.normalize(name)),
+                ' '.join(self.normalize(' '.join(ingredients.get(pk, ())))),
+                ' '.join(self.normalize(text)),
+            )
+            for pk, name, text in Recipe.objects.filter(
+                pk__in=recipe_ids
+            ).values_list('pk', 'name', 'text')
+        ]
+        self.remove(recipe_ids)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, name, ingredients, text) '
+                f'VALUES (%s, %s, %s, %s)',
+                rows
+            )
+
+    def remove(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN '
+                f'({", ".join(["%s"] * len(recipe_ids))})',
+                recipe_ids
+            )
+
+    def search(self, query, limit):
+        words = self.normalize(query)
+        if not words:
+            return []
+        match = ' '.join(f'"{word}"*' for word in words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, 10.0, 4.0, 1.0), rowid DESC '
+                f'LIMIT %s',
+                [match, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'postgresql': PostgresRecipeSearch,
+    'sqlite': SQLiteRecipeSearch,
+}
+
+
+@lru_cache(maxsize=None)
+def get_backend_for(vendor):
+    backend = BACKENDS.get(vendor)
+    return backend() if backend is not None else None
+
+
+def get_backend():
+    return get_backend_for(connection.vendor)
+
+
+def create_search_index():
+    backend = get_backend()
+    if backend is not None:
+        backend.create_index()
+
+
+def index_recipes(recipe_ids):
+    backend = get_backend()
+    if backend is not None and recipe_ids:
+        backend.index(recipe_ids)
+
+
+def remove_recipes(recipe_ids):
+    backend = get_backend()
+    if backend is not None and recipe_ids:
+        backend.remove(recipe_ids)
+
+
+def search_recipes(query, limit=None):
+    """Возвращает id рецептов по запросу, от наиболее релевантных"""
+    limit = limit or settings.RECIPE_SEARCH_LIMIT
+    backend = get_backend()
+    if backend is not None:
+        return backend.search(query, limit)
+    return list(
+        Recipe.objects.filter(name__icontains=query)
+        .values_list('pk', flat=True)[:limit]
+    )
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Ingredient, Recipe, ShoppingCartTotal, Tag, tags_mask
+from .search import create_search_index, index_recipes, remove_recipes
+
+# Изменение рецепта через API. Аргументы: instance, fields - измененные
+# поля модели, tags_added, tags_removed - id тегов, ingredients_added,
+# ingredients_removed, ingredients_changed - id ингредиентов.
+recipe_changed = Signal()
+
+SEARCH_FIELDS = {'name', 'text'}
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tags_mask(instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        recipes = Recipe.objects.filter(pk__in=pk_set or ())
+        mask = tags_mask([instance.pk])
+        if action == 'pre_clear':
+            recipes = Recipe.objects.filter(tags=instance)
+    else:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+        mask = tags_mask(pk_set or ())
+    if action == 'post_add':
+        recipes.update(tags_mask=F('tags_mask').bitor(mask))
+        if not reverse:
+            instance.tags_mask |= mask
+    elif action == 'post_remove' or reverse and action == 'pre_clear':
+        recipes.update(tags_mask=F('tags_mask').bitand(~mask))
+        if not reverse:
+            instance.tags_mask &= ~mask
+    elif action == 'post_clear' and not reverse:
+        recipes.update(tags_mask=0)
+        instance.tags_mask = 0
+
+
+@receiver(post_delete, sender=Tag)
+def clear_tag_bit(instance, **kwargs):
+    mask = tags_mask([instance.pk])
+    if mask:
+        Recipe.objects.filter(tags_mask__gt=0).update(
+            tags_mask=F('tags_mask').bitand(~mask)
+        )
+
+
+def setup_search_index(**kwargs):
+    create_search_index()
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(instance, **kwargs):
+    """Индексирует рецепт после коммита, когда записаны его ингредиенты"""
+    transaction.on_commit(lambda: index_recipes([instance.pk]))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_index(instance, **kwargs):
+    remove_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(instance, created, **kwargs):
+    if created:
+        return
+    recipe_ids = list(instance.ingredient_list.values_list(
+        'recipe_id', flat=True
+    ))
+    transaction.on_commit(lambda: index_recipes(recipe_ids))
+
+
+@receiver(recipe_changed)
+def reindex_changed_recipe(instance, fields, ingredients_added,
+                           ingredients_removed, **kwargs):
+    if fields & SEARCH_FIELDS or ingredients_added or ingredients_removed:
+        transaction.on_commit(lambda: index_recipes([instance.pk]))
+
+
+@receiver(recipe_changed)
+def refresh_cart_totals(instance, ingredients_added, ingredients_removed,
+                        ingredients_changed, **kwargs):
+    ingredients = ingredients_added | ingredients_removed | ingredients_changed
+    if ingredients:
+        ShoppingCartTotal.objects.refresh(
+            users=instance.shopping_list.values('user'),
+            ingredients=ingredients
+        )
@@ -1,4 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
@@ -6,8 +9,13 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from api.batch import add_relations, remove_relation, remove_relations
 from api.pagination import CustomPageNumberPagination
-from api.serializers import CustomUserSerializer, FollowSerializer
+from api.relations import relations_changed
+from api.serializers import (CustomUserSerializer, FollowSerializer,
+                             IdListSerializer)
+from api.sparse import sparse_fieldset
+from recipes.models import FeedEntry
 from .models import Follow
 
 User = get_user_model()
@@ -33,16 +41,64 @@ class CustomUserViewSet(UserViewSet):
                     'Нельзя подписаться на себя',
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            if Follow.objects.filter(user=user, author=author).exists():
+            try:
+                with transaction.atomic():
+                    Follow.objects.create(user=user, author=author)
+                    User.objects.filter(pk=author.pk).update(
+                        followers_count=F('followers_count') + 1
+                    )
+                    FeedEntry.objects.backfill(user, author)
+                    relations_changed(user.id)
+            except IntegrityError:
                 return Response('Вы уже подписаны',
                                 status=status.HTTP_400_BAD_REQUEST)
-            Follow.objects.create(user=user, author=author)
             serializer = FollowSerializer(author, context={'request': request})
             return Response(serializer.data, status.HTTP_201_CREATED)
-        subscription = get_object_or_404(Follow, user=user, author=author)
-        subscription.delete()
+        with transaction.atomic():
+            if not remove_relation(Follow, user=user, author=author):
+                raise Http404
+            User.objects.filter(pk=author.pk, followers_count__gt=0).update(
+                followers_count=F('followers_count') - 1
+            )
+            FeedEntry.objects.prune(user, [author])
+            relations_changed(user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='batch/subscribe',
+        permission_classes=[IsAuthenticated]
+    )
+    def subscribe_batch(self, request):
+        serializer = IdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        with transaction.atomic():
+            if request.method == 'POST':
+                results, changed = add_relations(
+                    Follow, user, 'author', ids,
+                    User.objects.exclude(pk=user.pk)
+                )
+                for author_id in changed:
+                    FeedEntry.objects.backfill(user, author_id)
+                counted = User.objects.filter(id__in=changed)
+                delta = 1
+            else:
+                results, changed = remove_relations(
+                    Follow, user, 'author', ids
+                )
+                FeedEntry.objects.prune(user, changed)
+                counted = User.objects.filter(
+                    id__in=changed, followers_count__gt=0
+                )
+                delta = -1
+            counted.update(followers_count=F('followers_count') + delta)
+            if changed:
+                relations_changed(user.id)
+        return Response({'results': results})
+
     @action(
         methods=['get'],
         detail=False,
@@ -50,7 +106,10 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user)
+        fields, _ = sparse_fieldset(request)
+        queryset = FollowSerializer.setup_eager_loading(
+            User.objects.filter(following__user=user), fields
+        )
         paginated_queryset = self.paginate_queryset(queryset)
         serializer = FollowSerializer(paginated_queryset,
                                       many=True,